@@ -0,0 +1,109 @@
+"""
+AsyncFindString
+
+A FindString for getMaxLength oracles that are network services or otherwise
+awaitable. The search methods are coroutines, so thousands of
+independent searches can run concurrently on one event loop, for example
+with find_many(). They are the searches of FindString, whose probes are
+awaited in turn rather than made directly (see FindString._drive), so every
+FindString search is available here. Each probe may be given a timeout, and
+the number of probes in flight may be bounded by a semaphore shared between
+searches.
+"""
+
+import asyncio
+import inspect
+
+from time import perf_counter_ns
+
+from findstring import FindString
+
+
+async def find_many(finders, method="binary_find"):
+    """Run the named search method of each AsyncFindString in finders
+    concurrently, returning a list of the results in the same order.
+    """
+    return await asyncio.gather(
+        *(getattr(finder, method)() for finder in finders))
+
+
+class AsyncFindString(FindString):
+    """FindString whose search methods are coroutines. The oracle's
+    getMaxLength() may be a coroutine function, or return an awaitable, or
+    be an ordinary function.
+
+    The other arguments are those of FindString, in the same order. A probe
+    taking longer than timeout seconds raises asyncio.TimeoutError. The
+    limit is an asyncio.Semaphore, or a number of permits for a new one, held
+    by each probe while it waits for the oracle; share one semaphore between
+    finders to bound the probes in flight across all of them. Both are
+    keyword-only.
+    """
+
+    timeout = None
+    semaphore = None
+
+    # the fast variants of the searches call the oracle directly
+    fast_path = False
+
+    def __init__(self, target, query, *args, timeout=None, limit=None,
+                 **kwargs):
+        super().__init__(target, query, *args, **kwargs)
+        if isinstance(limit, int):
+            limit = asyncio.Semaphore(limit)
+        self.timeout = timeout
+        self.semaphore = limit
+
+    # search drivers
+
+    async def _run(self, name, search, op, margin=None):
+        """See FindString._run."""
+        self._metrics_start(name)
+        self._trace(op, 0, self.tlen - 1, margin)
+        solution = await self._drive(search)
+        self._metrics_print()
+        return solution
+
+    async def _drive(self, search):
+        """Drives search like FindString._drive, awaiting the answer to each
+        probe.
+        """
+        try:
+            probe = next(search)
+            while True:
+                probe = search.send(await self._contains(*probe))
+        except StopIteration as stop:
+            return stop.value
+
+    # private methods
+
+    async def _getMaxLength(self, left, right):
+        length = self.oracle.getMaxLength(left, right)
+        if inspect.isawaitable(length):
+            length = await asyncio.wait_for(length, self.timeout)
+        return length
+
+    async def _contains(self, left, right):
+        """See FindString._contains."""
+        if self.cache is not None:
+            found = self.cache.lookup(left, right)
+            if self.show_metrics:
+                self.metrics.cached(found is not None)
+            if found is not None:
+                return found
+
+        if self.show_metrics:
+            self.metrics.update(left, right)
+            begin = perf_counter_ns()
+        if self.semaphore is None:
+            length = await self._getMaxLength(left, right)
+        else:
+            async with self.semaphore:
+                length = await self._getMaxLength(left, right)
+        if self.show_metrics:
+            self.metrics.timed(perf_counter_ns() - begin)
+        found = length >= self.qlen
+
+        if self.cache is not None:
+            self.cache.store(left, right, found)
+        return found
@@ -0,0 +1,119 @@
+"""
+BatchFinder
+
+Searches one target for many queries. The target is validated and converted
+to a buffer once, and each distinct query gets one FindString instance,
+shared by every repeat of that query while it is among the most recently
+used. An oracle answering for the query character alone, such as
+RunLengthOracle, indexes the target once per character and is shared by
+every query of that character, since FindString compares its answers with
+the query length at probe time. Optionally each query also gets a
+ProbeCache, so that repeated or overlapping searches for the same needle do
+not call the oracle again for intervals already answered, or implied by
+earlier answers. Probe results are only reused between repeats of the same
+query, not across queries.
+"""
+
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+from findstring import FindString
+from oracle import BufferOracle, as_buffer, as_bytes
+
+
+class BatchFinder:
+    """Answers batches of queries over a shared target with find_many(). The
+    oracle argument is a class (or other callable) constructing an oracle
+    from (target, query), for example BufferOracle or RunLengthOracle. The
+    cache argument is the size of the ProbeCache kept for each query, or
+    None for none. A cache lookup scans every cached probe, so it only pays
+    when queries repeat; without one, searches take the fast path. The size
+    argument is the number of queries whose finders are kept, least recently
+    used first to go.
+    """
+
+    DEFAULT_SIZE = 1024
+
+    target = None
+    tlen = 0
+    oracle = None
+    cache = None
+    size = 0
+    finders = None  # FindString instance of each recent query, LRU order
+    oracles = None  # oracle of each query character, if per_marker
+
+    # throughput of the most recent find_many
+    queries = 0
+    elapsed = 0.0
+
+    def __init__(self, target, oracle=BufferOracle, cache=None,
+                 size=DEFAULT_SIZE):
+        tlen = len(target)
+        if tlen < 1:
+            raise ValueError("target length less than 1")
+        if size < 1:
+            raise ValueError("size less than 1")
+
+        self.target = as_buffer(target)
+        self.tlen = tlen
+        self.oracle = oracle
+        self.cache = cache
+        self.size = size
+        self.finders = OrderedDict()
+        self.oracles = {}
+
+    def finder(self, query):
+        """Return the FindString instance for query, constructing it (and
+        its cache, and its oracle unless one is shared) on first use, and
+        evicting the least recently used if there are more than size.
+        """
+        key = as_bytes(query)
+        finder = self.finders.get(key)
+        if finder is not None:
+            self.finders.move_to_end(key)
+            return finder
+
+        finder = self.finders[key] = \
+            FindString(self.target, key, oracle=self._oracle(key),
+                       cache=self.cache)
+        if len(self.finders) > self.size:
+            self.finders.popitem(last=False)
+        return finder
+
+    def _oracle(self, key):
+        """Return an oracle for query key, shared by every query of its
+        character if the oracle class answers for the character alone.
+        """
+        if not getattr(self.oracle, "per_marker", False) or not key:
+            return self.oracle(self.target, key)
+        oracle = self.oracles.get(key[:1])
+        if oracle is None:
+            oracle = self.oracles[key[:1]] = self.oracle(self.target, key)
+        return oracle
+
+    def find_many(self, queries, method=FindString.binary_find):
+        """Search the target for each query in turn using method (one of the
+        FindString search methods), and return a list of the results,
+        (start, stop) inclusive or NO_MATCH, in the order of the queries.
+        """
+        begin = timer()
+        results = [method(self.finder(query)) for query in queries]
+        self.elapsed = timer() - begin
+        self.queries = len(results)
+        return results
+
+    def throughput(self):
+        """Return the queries per second achieved by the last find_many."""
+        return self.queries / self.elapsed if self.elapsed > 0 else 0.0
+
+    def print(self, msg=""):
+        """
+        Print throughput of the last find_many.
+
+        Example:
+
+          find_many: queries: 1000, seconds: 0.0125, queries/second: 80000.0
+        """
+
+        print("find_many: queries: %d, seconds: %6.4f, queries/second: %.1f %s"
+              % (self.queries, self.elapsed, self.throughput(), msg))
@@ -0,0 +1,242 @@
+"""
+Benchmark
+
+Times the FindString search methods over a grid of scenarios, and writes the
+results as JSON for comparison between runs. A scenario is one combination
+of:
+
+- target size     tlen = 2**exp for exp in min_exp..max_exp
+- query size      qlen = tlen >> shift for each shift
+- query position  left edge, centre, right edge or random
+- oracle          model (FindString.getMaxLength), buffer (a bytearray
+                  target) or runlength (a virtual target, see VirtualTarget)
+- method          naive_find, binary_find, margin_find, start_find, cost_find
+
+Each target is built once per scenario and each search is repeated and
+timed individually, reporting percentiles of the timings along with the
+funcalls and targetsum metrics of one search.
+
+Examples:
+
+  python benchmark.py --max-exp 16 --output bench.json
+  python benchmark.py --baseline bench.json
+  python benchmark.py --methods binary_find start_find --oracles buffer
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from findstring import FindString
+from timings import build_strings
+
+METHODS = ["naive_find", "binary_find", "margin_find", "start_find",
+           "cost_find"]
+ORACLES = ["model", "buffer", "runlength"]
+POSITIONS = ["left", "centre", "right", "random"]
+
+# largest target size exponent for scenarios that would otherwise take too
+# long: the model oracle copies the target on every call, the buffer oracle
+# holds the target in memory, and naive_find makes O(tlen) calls. The
+# runlength oracle searches a virtual target, described by its runs alone,
+# so takes constant memory and time per call at any size
+MAX_EXP = {"model": 20, "buffer": 30, "naive_find": 16}
+
+
+def query_start(position, tlen, qlen, rand):
+    """Return the start of the query in target for the named position."""
+    if position == "left":
+        return 0
+    if position == "centre":
+        return (tlen - qlen)//2
+    if position == "right":
+        return tlen - qlen
+    return rand.randint(0, tlen - qlen)
+
+
+def build_finder(oracle, tlen, qlen, start, metrics=False):
+    """Return a FindString for a target of length tlen containing a query of
+    length qlen at start, using the named oracle.
+    """
+    if oracle == "model":
+        target, query = build_strings(tlen, qlen, start)
+        return FindString(target, query, metrics=metrics)
+    if oracle == "buffer":
+        target, query = build_strings(tlen, qlen, start, kind="bytearray")
+        return FindString(target, query, metrics=metrics)
+    target, query = build_strings(tlen, qlen, start, kind="virtual")
+    return FindString(target, query, metrics=metrics,
+                      oracle=target.oracle(qlen))
+
+
+def percentiles(timings):
+    """Return summary statistics of timings (in seconds) as a dict."""
+    timings = sorted(timings)
+    if len(timings) > 1:
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+    else:
+        p50 = p90 = p99 = timings[0]
+    return {"min": timings[0], "p50": p50, "p90": p90, "p99": p99,
+            "max": timings[-1], "mean": statistics.fmean(timings)}
+
+
+def run_scenario(method, oracle, tlen, qlen, position, repeat, rand):
+    """Time repeat searches of one scenario and return its result as a
+    dict.
+    """
+    start = query_start(position, tlen, qlen, rand)
+    expect = (start, start + qlen - 1)
+
+    # one search with metrics, for funcalls and targetsum
+    finder = build_finder(oracle, tlen, qlen, start, metrics=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert getattr(finder, method)() == expect
+    calls, cumlen = finder.metrics.calls, finder.metrics.cumlen
+
+    finder.show_metrics = False
+    search = getattr(finder, method)
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        search()
+        timings.append(time.perf_counter() - begin)
+
+    return {"method": method, "oracle": oracle, "tlen": tlen, "qlen": qlen,
+            "position": position, "start": start, "repeat": repeat,
+            "funcalls": calls, "targetsum": cumlen,
+            "seconds": percentiles(timings)}
+
+
+def scenarios(args):
+    """Generate the (method, oracle, tlen, qlen, position) scenarios selected
+    by args.
+    """
+    for exp in range(args.min_exp, args.max_exp + 1, args.step):
+        tlen = 2**exp
+        for shift in args.shifts:
+            qlen = tlen >> shift
+            if qlen < 1:
+                continue
+            for oracle in args.oracles:
+                if exp > MAX_EXP.get(oracle, exp):
+                    continue
+                for method in args.methods:
+                    if exp > MAX_EXP.get(method, exp):
+                        continue
+                    for position in args.positions:
+                        yield method, oracle, tlen, qlen, position
+
+
+def run(args):
+    """Run the scenarios selected by args and return the report as a
+    dict.
+    """
+    rand = random.Random(args.seed)
+    results = []
+    for scenario in scenarios(args):
+        result = run_scenario(*scenario, args.repeat, rand)
+        results.append(result)
+        if args.verbose:
+            print("%-11s %-9s tlen 2**%-2d qlen %-8d %-6s p50 %.6fs "
+                  "funcalls %d targetsum %d" %
+                  (result["method"], result["oracle"],
+                   result["tlen"].bit_length() - 1, result["qlen"],
+                   result["position"], result["seconds"]["p50"],
+                   result["funcalls"], result["targetsum"]),
+                  file=sys.stderr)
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": args.seed,
+            "results": results}
+
+
+def key(result):
+    return (result["method"], result["oracle"], result["tlen"],
+            result["qlen"], result["position"])
+
+
+def regressions(report, baseline, tolerance):
+    """Return a list of messages describing results in report that are
+    slower (fastest time more than tolerance times greater, as the fastest
+    is least disturbed by other load) or make more getMaxLength calls than
+    the same scenario in baseline.
+    """
+    before = {key(result): result for result in baseline["results"]}
+    messages = []
+    for result in report["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        name = "%s %s tlen %d qlen %d %s" % key(result)
+        if result["seconds"]["min"] > old["seconds"]["min"] * tolerance:
+            messages.append("%s: min %.6fs was %.6fs" % (
+                name, result["seconds"]["min"], old["seconds"]["min"]))
+        if result["funcalls"] > old["funcalls"]:
+            messages.append("%s: funcalls %d was %d" % (
+                name, result["funcalls"], old["funcalls"]))
+    return messages
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the FindString search methods.")
+    parser.add_argument("--min-exp", type=int, default=10,
+                        help="smallest target size exponent (default 10)")
+    parser.add_argument("--max-exp", type=int, default=26,
+                        help="largest target size exponent (default 26)")
+    parser.add_argument("--step", type=int, default=4,
+                        help="target size exponent step (default 4)")
+    parser.add_argument("--shifts", type=int, nargs="+", default=[3, 7],
+                        help="query size is target size >> shift "
+                             "(default 3 7)")
+    parser.add_argument("--methods", nargs="+", default=METHODS,
+                        choices=METHODS)
+    parser.add_argument("--oracles", nargs="+", default=ORACLES,
+                        choices=ORACLES)
+    parser.add_argument("--positions", nargs="+", default=POSITIONS,
+                        choices=POSITIONS)
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="timed searches per scenario (default 20)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for random query positions (default 0)")
+    parser.add_argument("--output", help="write JSON here, not to stdout")
+    parser.add_argument("--baseline",
+                        help="JSON from an earlier run to check against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="slowdown allowed against baseline "
+                             "(default 1.25)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="report each scenario on stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as source:
+            messages = regressions(report, json.load(source), args.tolerance)
+        for message in messages:
+            print("REGRESSION:", message, file=sys.stderr)
+        return 1 if messages else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+CostModel
+
+The cost of a getMaxLength call is modelled as a fixed overhead per call plus
+a cost per character of target examined, so the cost of a search is
+
+  per_call * funcalls + per_char * targetsum
+
+A search over N candidate start positions that probes the first fraction f
+of them (an interval of f*N + qlen - 1 characters) at every step has an
+expected cost of roughly
+
+  (per_call + per_char * qlen) * log2(N) / H(f) + per_char * N / (2 * (1 - f))
+
+where H(f) is the binary entropy of f. The first term, the cost of the calls
+made, is least when f = 1/2; the second, the cost of the characters
+examined, is least as f approaches 0. CostModel.split() chooses f at each
+step to minimise the sum.
+"""
+
+from math import log2
+
+# fractions of the candidate start positions considered for each probe
+FRACTIONS = [i/64 for i in range(1, 33)]
+
+
+def _entropy(f):
+    return -f * log2(f) - (1 - f) * log2(1 - f)
+
+
+class CostModel:
+    """Cost of getMaxLength calls as per_call + per_char * length."""
+
+    per_call = 1.0
+    per_char = 0.0
+
+    def __init__(self, per_call=1.0, per_char=0.0):
+        if per_call < 0 or per_char < 0:
+            raise ValueError("cost less than 0")
+        if per_call == 0 and per_char == 0:
+            raise ValueError("cost model has no cost")
+        self.per_call = per_call
+        self.per_char = per_char
+
+    def cost(self, calls, chars):
+        """Return the cost of calls examining chars characters in total."""
+        return self.per_call * calls + self.per_char * chars
+
+    def expected(self, candidates, qlen, fraction):
+        """Return the approximate expected cost of finding the query among
+        candidates start positions, probing fraction of them at each step.
+        """
+        return (self.per_call + self.per_char * qlen) * \
+            log2(candidates) / _entropy(fraction) + \
+            self.per_char * candidates / (2 * (1 - fraction))
+
+    def split(self, candidates, qlen):
+        """Return how many of candidates (at least 2) start positions to
+        probe next, in 1 to candidates//2, minimising the expected cost.
+        """
+        fraction = min(FRACTIONS,
+                       key=lambda f: self.expected(candidates, qlen, f))
+        return min(max(round(fraction * candidates), 1), candidates//2)
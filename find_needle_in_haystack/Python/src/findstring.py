@@ -19,13 +19,18 @@ Constraint:
   which returns the length of the maximal candidate substring in the interval.
 """
 
+from time import perf_counter_ns
+
+from costmodel import CostModel
 from metrics import metrics
+from oracle import BUFFER_TYPES, BufferOracle, map_file
+from probecache import ProbeCache
 from trace import trace
 
 
 class FindString:
     """Class implements search methods to find a substring using the black box
-    getMaxLength() function (see problem specification). Three public search
+    getMaxLength() function (see problem specification). Five public search
     methods are defined:
 
     - naive_find()  - performs a linear scan.
@@ -34,34 +39,58 @@ class FindString:
                       in the central region if necessary.
     - margin_find() - performs a margin shinkage search eliminating marginal
                       pieces of the target sequence from both sides.
+    - start_find()  - performs a binary search over the candidate start
+                      positions of the query in the target.
+    - cost_find()   - performs a search over the candidate start positions,
+                      choosing probes to minimise the cost of getMaxLength.
+
+    For targets holding more than one instance of the query, find_all()
+    returns them all.
     """
 
+    __slots__ = (
+        "target", "query_string", "tlen", "qlen",
+        "show_metrics", "metrics",  # call metrics for getMaxLength
+        "show_trace", "trace",      # tracing
+        "oracle",  # provider of getMaxLength (see oracle.py), or this instance
+        "cache",   # memo of probe results (see probecache.py), if any
+    )
+
     # return value if search finds no match
     NO_MATCH = (-1, -1)
 
-    # call metrics for getMaxLength
-    show_metrics = False
-    metrics = None
-
-    # tracing
-    show_trace = False
-    trace = None
+    # searches without tracing, metrics or cache use the _fast variants of the
+    # search methods, unless a subclass overrides the methods they replace
+    fast_path = True
 
     # "black box" method
     def getMaxLength(self, startPosition, endPosition):
         """A model implementation of getMaxLength as defined in the
         specification. Rather than return the length of the longest substring,
         it returns the query string length (if found) or zero (if not found).
+        Only used when no other oracle is supplied.
         """
         segment = self.target[startPosition:endPosition+1]
         return self.qlen if self.query_string in "".join(segment) else 0
 
     # initialisation
 
-    def __init__(self, target, query, trace=False, metrics=False):
+    def __init__(self, target, query, trace=False, metrics=False,
+                 oracle=None, cache=None):
         """Construct a FindString instance. Throws ValueError for bad target or
         query sequence lengths (query bigger than target, target or query
         shorter than 1).
+
+        The optional oracle is an object providing getMaxLength() (see
+        oracle.py) to be called instead of the model implementation. A
+        bytes-like target is given a BufferOracle if no oracle is supplied.
+
+        The optional cache is a ProbeCache, a cache size, or True for the
+        default size, used to avoid repeating getMaxLength calls for
+        intervals already examined by this or earlier searches.
+
+        The optional trace is True, or the number of events to keep, to record
+        the stages of searches (see trace.py).
         """
         tlen, qlen = len(target), len(query)
 
@@ -72,24 +101,59 @@ class FindString:
         if qlen < 1:
             raise ValueError("query length less than 1")
 
-        self._initialise(target, query, tlen, qlen, trace, metrics)
+        if oracle is None and isinstance(target, BUFFER_TYPES):
+            oracle = BufferOracle(target, query)
 
-    def _initialise(self, target, query, tlen, qlen, trace, metrics):
+        if cache is True:
+            cache = ProbeCache()
+        elif cache is False:
+            cache = None
+        elif cache is not None and not isinstance(cache, ProbeCache):
+            cache = ProbeCache(cache)
+
+        self._initialise(target, query, tlen, qlen, trace, metrics, oracle,
+                         cache)
+
+    def _initialise(self, target, query, tlen, qlen, trace, metrics, oracle,
+                    cache):
         self.target = target
-        self.query_string = "".join(query)  # for getMaxLength
+        self.query_string = self._join(query)  # for getMaxLength
         self.tlen = tlen
         self.qlen = qlen
-        self.show_trace = trace
+        self.show_trace = bool(trace)
         self.show_metrics = metrics
-        self._trace_start()
+        self.trace = None
+        self.metrics = None
+        self.oracle = self if oracle is None else oracle
+        self.cache = cache
+        self._trace_start(trace)
+
+    @classmethod
+    def from_file(cls, path, query, **kwargs):
+        """Construct a FindString instance whose target is the file at path,
+        memory mapped rather than read, with a BufferOracle searching it in
+        place. Close the target when finished with.
+        """
+        return cls(map_file(path), query, **kwargs)
 
-    def _trace_start(self):
+    @staticmethod
+    def _join(query):
+        if isinstance(query, BUFFER_TYPES):
+            return bytes(query).decode("latin-1")
+        return "".join(query)
+
+    def _trace_start(self, size=True):
         if self.show_trace:
-            self.trace = trace(self)
+            self.trace = trace(self) if size is True else trace(self, size)
 
     def _trace(self, text, left, right, margin=None):
         if self.show_trace:
-            self.trace.print(text, left, right, margin)
+            self.trace.record(text, left, right, margin)
+        self._phase(text)
+
+    def _phase(self, op):
+        if self.show_metrics:
+            self.metrics.phase(op)
 
     def _metrics_start(self, name=""):
         if self.show_metrics:
@@ -99,47 +163,133 @@ class FindString:
         if self.show_metrics:
             self.metrics.print(msg)
 
+    def _fast(self):
+        """Returns True if a search can take the fast path."""
+        return self.fast_path and not (self.show_trace or self.show_metrics or
+                                       self.cache is not None)
+
     # public methods
 
     def naive_find(self):
         """naive_find performs a linear scan for query in target and returns
         (start, stop) inclusive if found, or NO_MATCH otherwise.
         """
-        self._metrics_start("naive_find")
-        self._trace("nf in", 0, self.tlen - 1)
-        solution = self._linear_scan(0, self.tlen - 1)
-        self._metrics_print()
-        return solution
+        return self._run("naive_find", self._linear_scan(0, self.tlen - 1),
+                         "nf in")
 
     def binary_find(self):
         """binary_find performs a binary search for query in target and returns
         (start, stop) inclusive if found, or NO_MATCH otherwise.
         """
-        self._metrics_start("binary_find")
-        self._trace("bf in", 0, self.tlen - 1)
-        solution = self._binary_find(0, self.tlen - 1)
-        self._metrics_print()
-        return solution
+        if self._fast():
+            return self._binary_find_fast(0, self.tlen - 1)
+        return self._run("binary_find", self._binary_find(0, self.tlen - 1),
+                         "bf in")
 
     def margin_find(self):
         """margin_find performs a margin-reducing search for query in target
         and returns (start, stop) inclusive if found, or NO_MATCH otherwise.
         """
-        self._metrics_start("margin_find")
-        self._trace("mf in", 0, self.tlen - 1, self.tlen//2)
-        solution = self._margin_find(0, self.tlen - 1, self.tlen//2)
+        margin = self.tlen//2
+        if self._fast():
+            return self._margin_find_fast(0, self.tlen - 1, margin)
+        return self._run("margin_find",
+                         self._margin_find(0, self.tlen - 1, margin),
+                         "mf in", margin)
+
+    def start_find(self):
+        """start_find performs a binary search over candidate start positions
+        of query in target and returns (start, stop) inclusive if found, or
+        NO_MATCH otherwise.
+        """
+        return self._run("start_find", self._start_find(0, self.tlen - 1),
+                         "sf in")
+
+    def cost_find(self, model=None):
+        """cost_find performs a search over candidate start positions of query
+        in target, choosing each probe to minimise the expected total cost of
+        getMaxLength calls under model (a CostModel, by default one counting
+        calls only), and returns (start, stop) inclusive if found, or NO_MATCH
+        otherwise.
+        """
+        search = self._cost_find(0, self.tlen - 1, model or CostModel())
+        return self._run("cost_find", search, "cf in")
+
+    def find_all(self):
+        """find_all performs a search for every start position of query in
+        target and returns a list of (start, stop) inclusive of each maximal
+        run of query at consecutive start positions (such as a run of the
+        query character longer than query), in ascending order, or an empty
+        list if there are none.
+        """
+        return self._run("find_all", self._find_all(0, self.tlen - 1),
+                         "fa in")
+
+    # search drivers
+
+    def _run(self, name, search, op, margin=None):
+        """Runs search over the whole target, with metrics under name and
+        op as its first trace event, and returns its result.
+        """
+        self._metrics_start(name)
+        self._trace(op, 0, self.tlen - 1, margin)
+        solution = self._drive(search)
         self._metrics_print()
         return solution
 
+    def _drive(self, search):
+        """Drives search, a generator yielding the (left, right) intervals it
+        probes, sending back whether each contains query, and returns the
+        value it returns. Each search algorithm is written once this way,
+        whatever answers its probes (see asyncfindstring.py).
+        """
+        try:
+            probe = next(search)
+            while True:
+                probe = search.send(self._contains(*probe))
+        except StopIteration as stop:
+            return stop.value
+
+    # search hooks, for subclasses that look ahead (see speculative.py)
+
+    def _step_binary(self, left, right):
+        """Called at each step of _binary_find, before its probes."""
+
+    def _step_margin(self, left, right, margin):
+        """Called at each step of _margin_find, before its probes."""
+
+    def _narrow(self, left, right):
+        """Called when _binary_find or _margin_find narrows its segment to
+        (left, right) inclusive.
+        """
+
     # private methods
 
     def _contains(self, left, right):
-        """Returns True if target exactly contains query in (left, right)
-        inclusive.
+        """Returns True if target contains query in (left, right) inclusive,
+        that is if getMaxLength is at least qlen: an oracle returning the
+        longest run (see oracle.py) may report a run longer than query.
         """
+        if self.cache is not None:
+            found = self.cache.lookup(left, right)
+            if self.show_metrics:
+                self.metrics.cached(found is not None)
+            if found is not None:
+                return found
+
         if self.show_metrics:
             self.metrics.update(left, right)
-        return self.getMaxLength(left, right) == self.qlen
+            begin = perf_counter_ns()
+            found = self.oracle.getMaxLength(left, right) >= self.qlen
+            self.metrics.timed(perf_counter_ns() - begin)
+        else:
+            found = self.oracle.getMaxLength(left, right) >= self.qlen
+
+        if self.cache is not None:
+            self.cache.store(left, right, found)
+        return found
+
+    # searches, as generators yielding the intervals they probe (see _drive)
 
     def _linear_scan(self, left, right):
         """
@@ -150,7 +300,7 @@ class FindString:
         self._trace("ls in", left, right)
         for start in range(left, right + 1):
             stop = start + self.qlen - 1
-            if self._contains(start, stop):
+            if (yield start, stop):
                 self._trace("ls >>", start, stop)
                 return (start, stop)
         self._trace("ls ee", left, right)
@@ -163,41 +313,76 @@ class FindString:
         algorithm (margin_find) if the target can no longer be halved. Returns
         (left, right) inclusive if found, or NO_MATCH otherwise.
         """
-        slen = right - left + 1
-        margin = slen//2
-
-        # case 0a
-        if slen < self.qlen:
-            self._trace("bf ee", left, right)
-            return self.NO_MATCH
+        while True:
+            slen = right - left + 1
+            margin = slen//2
 
-        # cases 0b and 1
-        if slen == self.qlen:
-            if self._contains(left, right):  # case 1
-                self._trace("bf >>", left, right)
-                return (left, right)
-            else:                            # case 0b
+            # case 0a
+            if slen < self.qlen:
                 self._trace("bf ee", left, right)
                 return self.NO_MATCH
 
-        # case 2: examine left side
-        if self._contains(left, right - margin):
-            right -= margin
-            self._trace("bf bl", left, right)
-            return self._binary_find(left, right)
-
-        # case 3: examine right side
-        if self._contains(left + margin, right):
-            left += margin
-            self._trace("bf br", left, right)
-            return self._binary_find(left, right)
-
-        # case 4: examine centre
-        split = right - margin
-        left = max(left, (split - self.qlen + 2))
-        right = min((split + self.qlen - 1), right)
-        # return self._linear_scan(left, right)  # linear scan is slow
-        return self._margin_find(left, right, self.qlen//2)
+            self._step_binary(left, right)
+
+            # cases 0b and 1
+            if slen == self.qlen:
+                if (yield left, right):  # case 1
+                    self._trace("bf >>", left, right)
+                    return (left, right)
+                else:                            # case 0b
+                    self._trace("bf ee", left, right)
+                    return self.NO_MATCH
+
+            # case 2: examine left side
+            if (yield left, right - margin):
+                right -= margin
+                self._trace("bf bl", left, right)
+                self._narrow(left, right)
+                continue
+
+            # case 3: examine right side
+            if (yield left + margin, right):
+                left += margin
+                self._trace("bf br", left, right)
+                self._narrow(left, right)
+                continue
+
+            # case 4: examine centre
+            self._phase("bf ce")
+            split = right - margin
+            left = max(left, (split - self.qlen + 2))
+            right = min((split + self.qlen - 1), right)
+            self._narrow(left, right)
+            # return self._linear_scan(left, right)  # linear scan is slow
+            return (yield from self._margin_find(left, right, self.qlen//2))
+
+    def _binary_find_fast(self, left, right):
+        """
+        Performs _binary_find without tracing, metrics or cache, calling the
+        oracle directly with attributes held in locals.
+        """
+        getMaxLength, qlen = self.oracle.getMaxLength, self.qlen
+
+        while True:
+            slen = right - left + 1
+
+            if slen < qlen:                              # case 0a
+                return self.NO_MATCH
+            if slen == qlen:                             # cases 0b and 1
+                if getMaxLength(left, right) >= qlen:
+                    return (left, right)
+                return self.NO_MATCH
+
+            margin = slen >> 1
+            if getMaxLength(left, right - margin) >= qlen:    # case 2
+                right -= margin
+            elif getMaxLength(left + margin, right) >= qlen:  # case 3
+                left += margin
+            else:                                             # case 4
+                split = right - margin
+                return self._margin_find_fast(max(left, split - qlen + 2),
+                                              min(split + qlen - 1, right),
+                                              qlen >> 1)
 
     def _margin_find(self, left, right, margin):
         """
@@ -214,9 +399,11 @@ class FindString:
                 self._trace("mf ee", left, right, margin)
                 return self.NO_MATCH
 
+            self._step_margin(left, right, margin)
+
             # cases 0b and 1
             if slen == self.qlen:
-                if self._contains(left, right):  # case 1
+                if (yield left, right):  # case 1
                     self._trace("mf >>", left, right)
                     return (left, right)
                 else:                            # case 0b
@@ -224,17 +411,176 @@ class FindString:
                     return self.NO_MATCH
 
             # case 2: examine left side
-            if self._contains(left, right - margin):
+            if (yield left, right - margin):
                 right -= margin
                 self._trace("mf bl", left, right, margin)
+                self._narrow(left, right)
                 continue
 
             # case 3: examine right side
-            if self._contains(left + margin, right):
+            if (yield left + margin, right):
                 left += margin
                 self._trace("mf br", left, right, margin)
+                self._narrow(left, right)
                 continue
 
+            # case 0c: no match at the smallest margin
+            if margin == 1:
+                self._trace("mf ee", left, right, margin)
+                return self.NO_MATCH
+
             # case 4: margin was too big
             margin = max(margin//2, 1)
             self._trace("mf sh", left, right, margin)
+
+    def _margin_find_fast(self, left, right, margin):
+        """
+        Performs _margin_find without tracing, metrics or cache, calling the
+        oracle directly with attributes held in locals.
+        """
+        getMaxLength, qlen = self.oracle.getMaxLength, self.qlen
+
+        while True:
+            slen = right - left + 1
+
+            if slen < qlen:                                   # case 0a
+                return self.NO_MATCH
+            if slen == qlen:                                  # cases 0b and 1
+                if getMaxLength(left, right) >= qlen:
+                    return (left, right)
+                return self.NO_MATCH
+
+            if getMaxLength(left, right - margin) >= qlen:    # case 2
+                right -= margin
+            elif getMaxLength(left + margin, right) >= qlen:  # case 3
+                left += margin
+            elif margin == 1:                                 # case 0c
+                return self.NO_MATCH
+            else:                                             # case 4
+                margin >>= 1
+
+    def _start_find(self, left, right):
+        """
+        Performs a binary search for the start of query in target, halving the
+        candidate start positions, left to right - qlen + 1, with each call to
+        getMaxLength. If query is contained in (middle, right) it starts at or
+        after middle, otherwise it stops before middle + qlen - 1. At most
+        ceil(log2(slen - qlen + 1)) + 1 calls are made. Returns (left, right)
+        inclusive if found, or NO_MATCH otherwise.
+        """
+        found = False  # segment is known to contain query
+
+        while right - left + 1 > self.qlen:
+            middle = (left + right - self.qlen + 2)//2
+
+            if (yield middle, right):  # starts at or after middle
+                left, found = middle, True
+                self._trace("sf br", left, right)
+            else:                              # starts before middle
+                right = middle + self.qlen - 2
+                self._trace("sf bl", left, right)
+
+        if found or (yield left, right):
+            self._trace("sf >>", left, right)
+            return (left, right)
+        self._trace("sf ee", left, right)
+        return self.NO_MATCH
+
+    def _find_all(self, left, right):
+        """
+        Performs a search for every start position of query in target, as
+        repeated binary searches for the leftmost start at or after the end
+        of the last run found. Once a start is found, the end of its run of
+        consecutive starts is found by _run_end, so each run costs
+        O(log2(slen) + log2(qlen)) calls, plus one for each further qlen
+        start positions it spans, however many start positions it holds.
+        Returns a list of (left, right) inclusive of each maximal run of
+        query at consecutive start positions.
+        """
+        qlen = self.qlen
+        last = right - qlen + 1  # last candidate start position
+        runs = []
+
+        first = left
+        while first <= last and (yield first, right):
+            # binary search for the leftmost start in first to stop, which
+            # is known to hold one
+            stop = last
+            while first < stop:
+                middle = (first + stop)//2
+                if (yield first, middle + qlen - 1):
+                    stop = middle
+                    self._trace("fa bl", first, stop + qlen - 1)
+                else:
+                    first = middle + 1
+                    self._trace("fa br", first, stop + qlen - 1)
+
+            stop = yield from self._run_end(first, last)
+            runs.append((first, stop + qlen - 1))
+            self._trace("fa >>", first, stop + qlen - 1)
+            first = stop + 2  # stop + 1 is not a start
+
+        if not runs:
+            self._trace("fa ee", left, right)
+        return runs
+
+    def _run_end(self, start, last):
+        """
+        Returns the last of the run of consecutive start positions of query
+        from start, no further than last, galloping rightwards in steps
+        doubling up to qlen, then binary searching the last step. Consecutive
+        starts mean query is one repeated character, so any position between
+        two starts no more than qlen apart is also a start.
+        """
+        qlen = self.qlen
+        stop, step = start, 1
+
+        while True:
+            probe = min(stop + step, last)
+            if probe == stop:
+                return stop
+            if not (yield probe, probe + qlen - 1):
+                break
+            stop, step = probe, min(2 * step, qlen)
+            self._trace("fa br", start, stop + qlen - 1)
+
+        # the run ends before probe, no more than qlen after stop
+        high = probe - 1
+        while stop < high:
+            middle = (stop + high + 1)//2
+            if (yield middle, middle + qlen - 1):
+                stop = middle
+                self._trace("fa br", start, stop + qlen - 1)
+            else:
+                high = middle - 1
+                self._trace("fa bl", start, high + qlen - 1)
+        return stop
+
+    def _cost_find(self, left, right, model):
+        """
+        Performs a search for the start of query in target like _start_find,
+        but probes a leading piece of the candidate start positions whose size
+        is chosen by model. Narrow probes examine fewer characters but
+        eliminate fewer candidates, so a model with a high cost per character
+        relative to its cost per call favours them. Returns (left, right)
+        inclusive if found, or NO_MATCH otherwise.
+        """
+        found = False  # segment is known to contain query
+
+        while right - left + 1 > self.qlen:
+            candidates = right - left - self.qlen + 2
+            split = left + model.split(candidates, self.qlen)
+            stop = split + self.qlen - 2
+
+            if (yield left, stop):  # starts before split
+                right, found = stop, True
+                self._trace("cf bl", left, right)
+            else:                           # starts at or after split
+                left = split
+                self._trace("cf br", left, right)
+
+        if found or (yield left, right):
+            self._trace("cf >>", left, right)
+            return (left, right)
+        self._trace("cf ee", left, right)
+        return self.NO_MATCH
@@ -1,17 +1,210 @@
+class histogram:
+    """
+    Log-linear histogram of non-negative integers, such as probe times in
+    nanoseconds, in the style of an HDR histogram: values are counted in
+    buckets of 2**SUB_BITS per power of 2, so any value recorded is known to
+    within 1 part in 2**SUB_BITS (6% for SUB_BITS = 4).
+
+    Buckets are keyed by their lowest value, so histograms merge by adding
+    counts.
+    """
+
+    SUB_BITS = 4
+
+    counts = None  # count of values by bucket
+    count = 0      # number of values
+    total = 0      # sum of values
+    min = None
+    max = None
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        """Return the (lowest, highest) values in the bucket for value."""
+        shift = max(value.bit_length() - self.SUB_BITS, 0)
+        lowest = value >> shift << shift
+        return lowest, lowest + (1 << shift) - 1
+
+    def record(self, value):
+        lowest = self._bucket(value)[0]
+        self.counts[lowest] = self.counts.get(lowest, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add the values recorded by histogram other to this one."""
+        for lowest, count in other.counts.items():
+            self.counts[lowest] = self.counts.get(lowest, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else \
+                min(self.min, other.min)
+            self.max = other.max if self.max is None else \
+                max(self.max, other.max)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Return the highest value equivalent to the value below which
+        percent of values lie, or 0 if none are recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(percent * self.count / 100, 1)
+        seen = 0
+        for lowest in sorted(self.counts):
+            seen += self.counts[lowest]
+            if seen >= rank:
+                return min(self._bucket(lowest)[1], self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """Return the number of values no greater than each of bounds, where
+        each bound is one less than a power of 2 (at least 2**SUB_BITS - 1),
+        so no bucket spans a bound.
+        """
+        return [sum(count for lowest, count in self.counts.items()
+                    if lowest <= bound) for bound in bounds]
+
+    def as_dict(self):
+        return {"count": self.count, "total": self.total,
+                "min": self.min, "max": self.max, "mean": self.mean(),
+                "p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "p999": self.percentile(99.9)}
+
+
 class metrics:
     name = ""
     calls = 0   # number of calls
     cumlen = 0  # cumulative length of target scanned
+    hits = 0    # number of probes answered by a cache
+    misses = 0  # number of probes not answered by a cache
+
+    # probe times in nanoseconds, overall and by stage of search (see the
+    # trace key in trace.py), each probe counted in the stage it leads to
+    latency = None
+    phases = None
+    pending = None  # times of probes not yet assigned a stage
+
+    # upper bounds in nanoseconds of the Prometheus histogram buckets,
+    # about 1us to 1s in powers of 2
+    PROMETHEUS_BOUNDS = [2**i - 1 for i in range(10, 31)]
 
     def __init__(self, name=""):
         self.name = name
         self.calls = 0
         self.cumlen = 0
+        self.hits = 0
+        self.misses = 0
+        self.latency = histogram()
+        self.phases = {}
+        self.pending = []
 
     def update(self, left, right):
         self.calls += 1
         self.cumlen += right - left + 1
 
+    def cached(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def timed(self, ns):
+        """Record the time of a probe in nanoseconds."""
+        self.latency.record(ns)
+        self.pending.append(ns)
+
+    def phase(self, op):
+        """Assign the times of the probes since the last stage to stage op."""
+        if self.pending:
+            if op not in self.phases:
+                self.phases[op] = histogram()
+            record = self.phases[op].record
+            for ns in self.pending:
+                record(ns)
+            self.pending = []
+
+    # aggregation
+
+    def merge(self, other):
+        """Add the metrics of other, such as from another search, to these."""
+        self.calls += other.calls
+        self.cumlen += other.cumlen
+        self.hits += other.hits
+        self.misses += other.misses
+        self.latency.merge(other.latency)
+        for op, times in other.phases.items():
+            if op not in self.phases:
+                self.phases[op] = histogram()
+            self.phases[op].merge(times)
+        self.pending.extend(other.pending)
+
+    @classmethod
+    def aggregate(cls, many, name=""):
+        """Return the sum of an iterable of metrics."""
+        total = cls(name)
+        for other in many:
+            total.merge(other)
+        return total
+
+    # export
+
+    def as_dict(self):
+        return {"name": self.name, "funcalls": self.calls,
+                "targetsum": self.cumlen, "cachehits": self.hits,
+                "cachemisses": self.misses,
+                "latency_ns": self.latency.as_dict(),
+                "phases": {op: times.as_dict()
+                           for op, times in sorted(self.phases.items())}}
+
+    def prometheus(self, prefix="findstring"):
+        """Return the metrics in Prometheus text exposition format, with
+        probe times as histograms in seconds labelled by stage.
+
+        Example:
+
+          findstring_funcalls_total{method="naive_find"} 6
+          ...
+          findstring_probe_seconds_bucket{method="naive_find",le="1.023e-06"} 5
+        """
+        method = 'method="%s"' % self.name
+        lines = []
+        for metric, value in (("funcalls", self.calls),
+                              ("targetsum", self.cumlen),
+                              ("cachehits", self.hits),
+                              ("cachemisses", self.misses)):
+            lines.append("# TYPE %s_%s_total counter" % (prefix, metric))
+            lines.append("%s_%s_total{%s} %d" %
+                         (prefix, metric, method, value))
+
+        name = prefix + "_probe_seconds"
+        lines.append("# TYPE %s histogram" % name)
+        series = [(method, self.latency)]
+        series += [('%s,phase="%s"' % (method, op), times)
+                   for op, times in sorted(self.phases.items())]
+        for labels, times in series:
+            counts = times.cumulative(self.PROMETHEUS_BOUNDS)
+            for bound, count in zip(self.PROMETHEUS_BOUNDS, counts):
+                lines.append('%s_bucket{%s,le="%.4g"} %d' %
+                             (name, labels, bound / 1e9, count))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' %
+                         (name, labels, times.count))
+            lines.append("%s_sum{%s} %.9f" % (name, labels, times.total / 1e9))
+            lines.append("%s_count{%s} %d" % (name, labels, times.count))
+        return "\n".join(lines) + "\n"
+
     def print(self, msg=""):
         """
         Print metrics.
@@ -19,14 +212,41 @@ class metrics:
         Example:
 
           margin_find: funcalls: 6, targetsum: 26
+          margin_find: funcalls: 2, targetsum: 9, cachehits: 4, cachemisses: 2
 
         Key:
 
-          funcalls  = number of calls to getMaxLength
-          targetsum = cumulative length of target examined by getMaxLength
+          funcalls    = number of calls to getMaxLength
+          targetsum   = cumulative length of target examined by getMaxLength
+          cachehits   = number of probes answered by the cache (if any)
+          cachemisses = number of probes passed on to getMaxLength
         """
 
         if self.name:
             print(self.name, end=": ")
 
-        print("funcalls: %d, targetsum: %d %s" % (self.calls, self.cumlen, msg))
+        out = "funcalls: %d, targetsum: %d" % (self.calls, self.cumlen)
+        if self.hits or self.misses:
+            out += ", cachehits: %d, cachemisses: %d" % \
+                (self.hits, self.misses)
+
+        print(out, msg)
+
+    def print_latency(self):
+        """
+        Print probe times in microseconds, overall and by stage of search.
+
+        Example:
+
+          probes        count    mean     p50     p90     p99     max
+          all               6   0.412   0.383   0.511   0.767   0.767
+          mf bl             2   0.391   0.383   0.399   0.399   0.399
+        """
+        print("%-10s %8s %7s %7s %7s %7s %7s" %
+              ("probes", "count", "mean", "p50", "p90", "p99", "max"))
+        rows = [("all", self.latency)] + sorted(self.phases.items())
+        for op, times in rows:
+            print("%-10s %8d %7.3f %7.3f %7.3f %7.3f %7.3f" %
+                  (op, times.count, times.mean() / 1e3,
+                   times.percentile(50) / 1e3, times.percentile(90) / 1e3,
+                   times.percentile(99) / 1e3, (times.max or 0) / 1e3))
@@ -0,0 +1,214 @@
+"""
+NumpyOracle
+
+A getMaxLength oracle holding the target as a NumPy uint8 array, indexed as
+arrays of the (start, stop) positions of its runs of the query character,
+that can evaluate a whole batch of (left, right) intervals in one vectorised
+call with getMaxLengths().
+
+start_find_many() runs many independent start_find searches over segments
+of one target in lockstep, issuing one batch of probes per step, and
+simulate() uses it to run a large number of searches of randomly placed
+queries, each in a target of its own, for capacity planning:
+
+  python numpyoracle.py --count 1000000
+
+NumPy is optional: the rest of the package works without it, and
+constructing a NumpyOracle without it raises ImportError.
+"""
+
+import argparse
+import sys
+import time
+
+from oracle import as_buffer, as_bytes
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("NumpyOracle requires numpy")
+
+
+class NumpyOracle:
+    """Implements getMaxLength() as specified, returning the length of the
+    longest run of the query character within the interval, like
+    RunLengthOracle, with getMaxLengths() evaluating arrays of intervals at
+    once. Each interval costs two binary searches (numpy.searchsorted) and
+    at most three sparse table lookups, independent of its length.
+    """
+
+    # answers depend on the query character only, not the query length
+    per_marker = True
+
+    tlen = 0
+    qlen = 0
+    starts = None  # start position of each run, ascending
+    stops = None   # stop position (inclusive) of each run, ascending
+    table = None   # table[k, i] = longest run in runs i to i + 2**k - 1
+
+    def __init__(self, target, query):
+        _require_numpy()
+        marker = as_bytes(query[:1])[0]
+        array = np.frombuffer(as_buffer(target), dtype=np.uint8)
+        edges = np.diff((array == marker).astype(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1) - 1
+        self._index(len(array), len(query), starts, stops)
+
+    @classmethod
+    def from_runs(cls, tlen, qlen, starts, stops):
+        """Construct an oracle for a target of length tlen described only by
+        the start and stop (inclusive) positions of its runs of the query
+        character, as ascending sequences, without the target itself.
+        """
+        _require_numpy()
+        oracle = cls.__new__(cls)
+        oracle._index(tlen, qlen, starts, stops)
+        return oracle
+
+    def _index(self, tlen, qlen, starts, stops):
+        self.tlen = tlen
+        self.qlen = qlen
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        lengths = self.stops - self.starts + 1
+        count = len(lengths)
+        levels = max(count, 1).bit_length()
+        dtype = np.int32 if tlen < 2**31 else np.int64
+        self.table = np.zeros((levels, count), dtype=dtype)
+        self.table[0] = lengths
+        span = 1
+        for k in range(1, levels):
+            row, previous = self.table[k], self.table[k - 1]
+            size = count - 2 * span + 1
+            row[:size] = np.maximum(previous[:size],
+                                    previous[span:span + size])
+            span *= 2
+
+    def getMaxLengths(self, startPositions, endPositions):
+        """Return an array of getMaxLength() for each of the intervals in
+        the arrays (or sequences) startPositions and endPositions.
+        """
+        lefts = np.asarray(startPositions, dtype=np.int64)
+        rights = np.asarray(endPositions, dtype=np.int64)
+        count = len(self.starts)
+        if count == 0:
+            return np.zeros(lefts.shape, dtype=np.int64)
+        starts, stops = self.starts, self.stops
+
+        first = np.searchsorted(stops, lefts, "left")
+        last = np.searchsorted(starts, rights, "right") - 1
+        empty = first > last
+        first = np.minimum(first, count - 1)
+        last = np.maximum(last, 0)
+
+        # the outermost runs may be clipped by the interval
+        best = np.minimum(stops[first], rights) - \
+            np.maximum(starts[first], lefts) + 1
+        best = np.maximum(best, np.minimum(stops[last], rights) -
+                          np.maximum(starts[last], lefts) + 1)
+
+        # the longest of the runs between them, by sparse table
+        inner = last - first > 1
+        low = np.where(inner, first + 1, 0)
+        high = np.where(inner, last - 1, 0)
+        k = np.frexp((high - low + 1).astype(np.float64))[1] - 1
+        longest = np.maximum(self.table[k, low],
+                             self.table[k, high - (1 << k) + 1])
+        best = np.where(inner, np.maximum(best, longest), best)
+
+        return np.where(empty, 0, best)
+
+    def getMaxLength(self, startPosition, endPosition):
+        return int(self.getMaxLengths([startPosition], [endPosition])[0])
+
+
+def start_find_many(oracle, qlen, lefts, rights):
+    """Run FindString.start_find over each segment (lefts[i], rights[i])
+    inclusive of the target of oracle, which must provide getMaxLengths().
+    The searches run in lockstep, each step evaluating one probe for every
+    search not yet finished in a single batch, so they make the same probes
+    as start_find. Returns arrays of the (left, right) found by each search,
+    or -1 for no match, and of the getMaxLength calls and targetsum of each.
+    """
+    _require_numpy()
+    left = np.array(lefts, dtype=np.int64)
+    right = np.array(rights, dtype=np.int64)
+    found = np.zeros(left.shape, dtype=bool)
+    calls = np.zeros(left.shape, dtype=np.int64)
+    cumlen = np.zeros(left.shape, dtype=np.int64)
+
+    active = np.flatnonzero(right - left + 1 > qlen)
+    while len(active):
+        segment_left, segment_right = left[active], right[active]
+        middle = (segment_left + segment_right - qlen + 2)//2
+        hit = oracle.getMaxLengths(middle, segment_right) == qlen
+        calls[active] += 1
+        cumlen[active] += segment_right - middle + 1
+        left[active] = np.where(hit, middle, segment_left)
+        right[active] = np.where(hit, segment_right, middle + qlen - 2)
+        found[active] |= hit
+        active = active[right[active] - left[active] + 1 > qlen]
+
+    # segments never known to contain the query need one last check
+    check = np.flatnonzero(~found)
+    if len(check):
+        hit = oracle.getMaxLengths(left[check], right[check]) == qlen
+        calls[check] += 1
+        cumlen[check] += right[check] - left[check] + 1
+        found[check] = hit
+
+    return (np.where(found, left, -1), np.where(found, right, -1),
+            calls, cumlen)
+
+
+def simulate(tlen, qlen, count, seed=None):
+    """Simulate count start_find searches, each for a query of length qlen
+    placed at random in a target of its own of length tlen. The targets are
+    laid end to end as one virtual target described by its runs. Returns
+    the query starts and the results of start_find_many(), with positions
+    relative to the start of each target.
+    """
+    _require_numpy()
+    rand = np.random.default_rng(seed)
+    offsets = np.arange(count, dtype=np.int64) * tlen
+    starts = offsets + rand.integers(0, tlen - qlen, count, endpoint=True)
+    oracle = NumpyOracle.from_runs(tlen * count, qlen, starts,
+                                   starts + qlen - 1)
+    lefts, rights, calls, cumlen = start_find_many(oracle, qlen, offsets,
+                                                   offsets + tlen - 1)
+    found = lefts != -1
+    return (starts - offsets, np.where(found, lefts - offsets, -1),
+            np.where(found, rights - offsets, -1), calls, cumlen)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate many start_find searches with NumPy.")
+    parser.add_argument("--tlen", type=int, default=2**20)
+    parser.add_argument("--qlen", type=int, default=2**13)
+    parser.add_argument("--count", type=int, default=10**6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    begin = time.perf_counter()
+    starts, lefts, _, calls, cumlen = simulate(args.tlen, args.qlen,
+                                               args.count, args.seed)
+    elapsed = time.perf_counter() - begin
+    assert (lefts == starts).all()
+
+    print("simulated", args.count, "start_find searches in",
+          "%6.4f" % elapsed, "seconds,", "%d" % (args.count / elapsed),
+          "searches/second")
+    print("funcalls: mean %.2f, max %d, targetsum: mean %.0f" %
+          (calls.mean(), calls.max(), cumlen.mean()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Oracles
+
+Alternative implementations of the black box function
+
+  `
+  int getMaxLength(int startPosition, int endPosition)
+  `
+
+that can be plugged into a FindString instance in place of its own model
+implementation. An oracle is any object with a getMaxLength() method taking
+an inclusive (startPosition, endPosition) interval of the target.
+"""
+
+import mmap
+import re
+import tempfile
+
+from bisect import bisect_left, bisect_right
+
+# target types that can be searched in place without copying
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+def as_bytes(sequence):
+    """Return sequence (a str, a list of 1-character strings or a bytes-like
+    object) as bytes. Characters are encoded as latin-1 so that each one
+    occupies exactly one byte and positions are preserved.
+    """
+    if isinstance(sequence, BUFFER_TYPES):
+        return bytes(sequence)
+    return "".join(sequence).encode("latin-1")
+
+
+def map_file(path):
+    """Return a read-only memory map of the file at path, for use as a
+    target larger than memory. Close it when finished with.
+    """
+    with open(path, "rb") as source:
+        return mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def map_chunks(chunks, path=None):
+    """Write an iterable of bytes-like chunks to the file at path, or to an
+    anonymous temporary file, and return a read-only memory map of it, so
+    that a target can be streamed in without being held in memory. Close
+    it when finished with.
+    """
+    with open(path, "w+b") if path else tempfile.TemporaryFile() as spool:
+        for chunk in chunks:
+            spool.write(chunk)
+        spool.flush()
+        return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def as_buffer(target):
+    """Return target as an object supporting find(sub, start, end) without
+    copying where possible. bytes, bytearray and mmap objects are used as
+    they are, a memoryview is unwrapped to the object it views if it covers
+    the whole of it, and anything else is converted to bytes once.
+    """
+    if isinstance(target, memoryview):
+        base = target.obj
+        if hasattr(base, "find") and target.contiguous \
+                and target.nbytes == len(base):
+            return base
+        return target.tobytes()
+    if hasattr(target, "find") and not isinstance(target, str):
+        return target
+    return as_bytes(target)
+
+
+class BufferOracle:
+    """Implements getMaxLength() over a target held once as a bytes-like
+    object (bytes, bytearray, memoryview or mmap). Each call searches the
+    interval in place using the buffer's find() method, rather than slicing
+    and joining the target. Like the FindString model, it returns the query
+    length if the query is found in the interval, or zero otherwise.
+
+    Positions are relative to offset in target, so that a window of a larger
+    target (such as a shard, see shard.py) can be searched in place.
+    """
+
+    buffer = None
+    query = None
+    tlen = 0
+    qlen = 0
+    offset = 0
+
+    def __init__(self, target, query, offset=0):
+        self.buffer = as_buffer(target)
+        self.query = as_bytes(query)
+        self.tlen = len(self.buffer)
+        self.qlen = len(self.query)
+        self.offset = offset
+
+    def getMaxLength(self, startPosition, endPosition):
+        offset = self.offset
+        found = self.buffer.find(self.query, offset + startPosition,
+                                 offset + endPosition + 1)
+        return self.qlen if found != -1 else 0
+
+
+class RunLengthOracle:
+    """Implements getMaxLength() as specified, returning the length of the
+    longest run of the query character within the interval, rather than the
+    query length or zero. The target is indexed once as the (start, stop)
+    positions of each run of the query character, plus a sparse table of the
+    maximum run length over every power of two span of runs. Each call then
+    costs two bisections and at most three table lookups, independent of the
+    interval length.
+    """
+
+    # answers depend on the query character only, not the query length
+    per_marker = True
+
+    tlen = 0
+    qlen = 0
+    starts = None  # start position of each run, ascending
+    stops = None   # stop position (inclusive) of each run, ascending
+    table = None   # table[k][i] = longest run in runs i to i + 2**k - 1
+
+    def __init__(self, target, query):
+        marker = query[0]
+        if isinstance(marker, int):  # a bytes-like query
+            marker = chr(marker)
+        if isinstance(target, BUFFER_TYPES):
+            pattern = re.compile(re.escape(marker.encode("latin-1")) + b"+")
+        else:
+            target = "".join(target)
+            pattern = re.compile(re.escape(marker) + "+")
+        runs = ((m.start(), m.end() - 1) for m in pattern.finditer(target))
+        self._index(len(target), len(query), runs)
+
+    @classmethod
+    def from_runs(cls, tlen, qlen, runs):
+        """Construct an oracle for a target of length tlen described only by
+        the (start, stop) inclusive positions of its runs of the query
+        character, in ascending order, without the target itself.
+        """
+        oracle = cls.__new__(cls)
+        oracle._index(tlen, qlen, runs)
+        return oracle
+
+    def _index(self, tlen, qlen, runs):
+        self.tlen = tlen
+        self.qlen = qlen
+        self.starts, self.stops = [], []
+        for start, stop in runs:
+            self.starts.append(start)
+            self.stops.append(stop)
+        lengths = [stop - start + 1
+                   for start, stop in zip(self.starts, self.stops)]
+        self.table = [lengths]
+        span = 1
+        while 2 * span <= len(lengths):
+            row = self.table[-1]
+            self.table.append([max(row[i], row[i + span])
+                               for i in range(len(row) - span)])
+            span *= 2
+
+    def _longest(self, first, last):
+        """Return the longest run in runs first to last inclusive."""
+        k = (last - first + 1).bit_length() - 1
+        row = self.table[k]
+        return max(row[first], row[last - (1 << k) + 1])
+
+    def getMaxLength(self, startPosition, endPosition):
+        first = bisect_left(self.stops, startPosition)
+        last = bisect_right(self.starts, endPosition) - 1
+        if first > last:
+            return 0
+
+        # the outermost runs may be clipped by the interval
+        best = min(self.stops[first], endPosition) - \
+            max(self.starts[first], startPosition) + 1
+        if last > first:
+            best = max(best, min(self.stops[last], endPosition) -
+                       max(self.starts[last], startPosition) + 1)
+        if last - first > 1:
+            best = max(best, self._longest(first + 1, last - 1))
+        return best
+
+
+class VirtualTarget:
+    """A target of length tlen described only by the (start, stop) inclusive
+    positions of its runs of marker, in ascending order, every other
+    character being filler. It is never materialised: len() is tlen,
+    indexing finds the character by bisection and slicing builds only the
+    slice. Search it with the RunLengthOracle returned by oracle(), so
+    targets of any length cost memory only for their runs.
+    """
+
+    tlen = 0
+    runs = None    # (start, stop) inclusive of each run of marker
+    starts = None  # start position of each run, ascending
+    marker = 'x'
+    filler = '-'
+
+    def __init__(self, tlen, runs, marker='x', filler='-'):
+        self.tlen = tlen
+        self.runs = list(runs)
+        self.starts = [start for start, _ in self.runs]
+        self.marker = marker
+        self.filler = filler
+
+    def __len__(self):
+        return self.tlen
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.tlen)
+            if step != 1:
+                return "".join(self[i] for i in range(start, stop, step))
+            return self._text(start, stop)
+        if index < 0:
+            index += self.tlen
+        if not 0 <= index < self.tlen:
+            raise IndexError("target index out of range")
+        i = bisect_right(self.starts, index) - 1
+        if i >= 0 and index <= self.runs[i][1]:
+            return self.marker
+        return self.filler
+
+    def _text(self, start, stop):
+        """Return the characters from start up to (not including) stop."""
+        if start >= stop:
+            return ""
+        at = start
+        pieces = []
+        first = max(bisect_right(self.starts, start) - 1, 0)
+        for left, right in self.runs[first:]:
+            if left >= stop:
+                break
+            left, right = max(left, start), min(right + 1, stop)
+            if left < right:
+                pieces.append(self.filler * (left - at))
+                pieces.append(self.marker * (right - left))
+                at = right
+        pieces.append(self.filler * (stop - at))
+        return "".join(pieces)
+
+    def oracle(self, qlen):
+        """Return a RunLengthOracle for a query of length qlen in this
+        target, built from its runs.
+        """
+        return RunLengthOracle.from_runs(self.tlen, qlen, self.runs)
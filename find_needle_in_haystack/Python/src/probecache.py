@@ -0,0 +1,74 @@
+"""
+ProbeCache
+
+A size-bounded memo of probe results for FindString._contains(), so that
+intervals asked about more than once (for example by binary_find followed by
+margin_find on the same instance) are not passed to getMaxLength again.
+
+Besides exact repeats, results are inferred from the monotonicity of the
+question "does [left, right] contain the query?":
+
+- if [a, b] contains the query, so does any interval enclosing [a, b]
+- if [a, b] does not contain the query, neither does any interval inside it
+
+This holds for the query-length-or-zero model of getMaxLength, and for the
+specified getMaxLength, as a probe asks whether it returns at least the
+query length.
+"""
+
+from collections import OrderedDict
+
+
+class ProbeCache:
+    """Least recently used cache of up to size probe results, keyed by
+    (left, right) inclusive.
+    """
+
+    DEFAULT_SIZE = 128
+
+    size = 0
+    results = None
+    hits = 0      # answered by an exact repeat
+    inferred = 0  # answered by monotonicity
+    misses = 0    # not answered
+
+    def __init__(self, size=DEFAULT_SIZE):
+        if size < 1:
+            raise ValueError("cache size less than 1")
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.inferred = 0
+        self.misses = 0
+
+    def lookup(self, left, right):
+        """Return True or False if whether (left, right) contains the query
+        is known or can be inferred, or None otherwise.
+        """
+        key = (left, right)
+        found = self.results.get(key)
+        if found is not None:
+            self.results.move_to_end(key)
+            self.hits += 1
+            return found
+
+        for (start, stop), found in self.results.items():
+            if found:
+                if left <= start and stop <= right:
+                    self.inferred += 1
+                    return True
+            elif start <= left and right <= stop:
+                self.inferred += 1
+                return False
+
+        self.misses += 1
+        return None
+
+    def store(self, left, right, found):
+        """Remember whether (left, right) contains the query, evicting the
+        least recently used result if the cache is full.
+        """
+        self.results[(left, right)] = found
+        self.results.move_to_end((left, right))
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
@@ -0,0 +1,197 @@
+"""
+ShardedFindString
+
+Searches a target too large for one core to scan quickly by splitting it
+into shards, one per worker of a ProcessPoolExecutor. The target is copied
+once into a multiprocessing.shared_memory block, which each worker attaches
+to and searches in place with a BufferOracle, so the target is never
+pickled.
+
+The candidate start positions of the query are divided evenly between the
+shards, so each shard covers its start positions plus the qlen - 1
+characters after the last, overlapping the next shard by qlen - 1 and never
+losing a query straddling a boundary. Each start position belongs to
+exactly one shard, so results never need deduplicating, and find_all() runs
+that cross a boundary are joined.
+
+naive_find() scales with the number of cores, as its cost grows with the
+length of target searched; binary_find(), find_all() and the other
+logarithmic methods gain little.
+"""
+
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from findstring import FindString
+from oracle import BufferOracle, as_bytes
+
+# bytes copied at a time into shared memory by from_file()
+CHUNK_SIZE = 2**24
+
+
+def partitions(tlen, qlen, count):
+    """Return a list of at most count (left, right) inclusive shards of a
+    target of length tlen, dividing the candidate start positions of a query
+    of length qlen evenly between them.
+    """
+    candidates = tlen - qlen + 1
+    size = -(-candidates // count)  # ceiling division
+    return [(first, min(first + size, candidates) - 1 + qlen - 1)
+            for first in range(0, candidates, size)]
+
+
+def _search(name, query, left, right, method):
+    """Search shard (left, right) of the target in the shared memory block
+    name with the named method of FindString, in a worker process. Returns
+    the result with positions in the whole target.
+    """
+    shared = SharedMemory(name=name)
+    try:
+        view = shared.buf[left:right + 1]
+        try:
+            oracle = BufferOracle(shared.buf, query, offset=left)
+            finder = FindString(view, query, oracle=oracle)
+            result = getattr(finder, method)()
+            del finder, oracle
+        finally:
+            view.release()
+    finally:
+        shared.close()
+
+    if method == "find_all":
+        return [(start + left, stop + left) for start, stop in result]
+    if result == FindString.NO_MATCH:
+        return result
+    return (result[0] + left, result[1] + left)
+
+
+class ShardedFindString:
+    """Runs the FindString search methods over shards of a target in
+    parallel, on the supplied executor or a ProcessPoolExecutor with a
+    worker per shard. Throws ValueError for bad target or query lengths, as
+    FindString does. Close it, or use it as a context manager, to free the
+    shared memory.
+    """
+
+    shared = None  # SharedMemory block holding the target
+    tlen = 0
+    qlen = 0
+    query = None
+    shards = None  # list of (left, right) inclusive
+    executor = None
+
+    def __init__(self, target, query, shards=None, executor=None):
+        self._initialise(len(target), query, shards, executor)
+        try:
+            if isinstance(target, (str, list, tuple)):
+                target = as_bytes(target)
+            self.shared.buf[:self.tlen] = memoryview(target).cast("B")
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def from_file(cls, path, query, shards=None, executor=None):
+        """Construct a ShardedFindString whose target is the file at path,
+        read into shared memory in chunks.
+        """
+        finder = cls.__new__(cls)
+        with open(path, "rb") as source:
+            finder._initialise(os.fstat(source.fileno()).st_size, query,
+                               shards, executor)
+            try:
+                position = 0
+                while position < finder.tlen:
+                    end = min(position + CHUNK_SIZE, finder.tlen)
+                    with finder.shared.buf[position:end] as chunk:
+                        read = source.readinto(chunk)
+                    if not read:
+                        raise ValueError("file shorter than its size")
+                    position += read
+            except BaseException:
+                finder.close()
+                raise
+        return finder
+
+    def _initialise(self, tlen, query, shards, executor):
+        qlen = len(query)
+        if tlen < qlen:
+            raise ValueError("query is bigger than target")
+        if tlen < 1:
+            raise ValueError("target length less than 1")
+        if qlen < 1:
+            raise ValueError("query length less than 1")
+        if shards is not None and shards < 1:
+            raise ValueError("shards less than 1")
+
+        self.tlen = tlen
+        self.qlen = qlen
+        self.query = as_bytes(query)
+        self.shards = partitions(tlen, qlen, shards or os.cpu_count() or 1)
+        self.executor = executor
+        self.shared = SharedMemory(create=True, size=tlen)
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # public methods
+
+    def naive_find(self):
+        return self._first("naive_find")
+
+    def binary_find(self):
+        return self._first("binary_find")
+
+    def margin_find(self):
+        return self._first("margin_find")
+
+    def start_find(self):
+        return self._first("start_find")
+
+    def find_all(self):
+        """Return the runs found by FindString.find_all in every shard,
+        joining runs that continue from one shard into the next.
+        """
+        runs = []
+        for found in self._run("find_all"):
+            if found and runs and runs[-1][1] == found[0][0] + self.qlen - 2:
+                runs[-1] = (runs[-1][0], found[0][1])
+                found = found[1:]
+            runs.extend(found)
+        return runs
+
+    # private methods
+
+    def _first(self, method):
+        """Return the leftmost result of the named method over all shards,
+        or NO_MATCH.
+        """
+        for result in self._run(method):
+            if result != FindString.NO_MATCH:
+                return result
+        return FindString.NO_MATCH
+
+    def _run(self, method):
+        """Run the named method on every shard, returning a list of results
+        in shard order.
+        """
+        executor = self.executor or ProcessPoolExecutor(len(self.shards))
+        try:
+            futures = [executor.submit(_search, self.shared.name, self.query,
+                                       left, right, method)
+                       for left, right in self.shards]
+            return [future.result() for future in futures]
+        finally:
+            if self.executor is None:
+                executor.shutdown()
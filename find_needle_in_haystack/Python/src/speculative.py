@@ -0,0 +1,233 @@
+"""
+SpeculativeFindString
+
+A FindString for slow (for example remote or I/O bound) getMaxLength oracles.
+binary_find and margin_find submit the left and right probes of each step
+to an executor together, along with the probes of the steps that may follow
+it, rather than waiting for each answer in turn. Once a step is decided,
+outstanding probes lying outside the chosen segment are cancelled. They
+are the searches of FindString, speculating through its step hooks; the
+other searches make one probe at a time. Whichever search runs, the
+probes still pending when it ends are cancelled.
+
+With depth levels of speculation each binary_find step issues up to
+2 * (2**(depth+1) - 1) probes, two for each segment it may branch to, and
+each margin_find step up to 3**(depth+1) - 1, as it may also shrink its
+margin. The answers for the following depth steps are usually ready by the
+time they are needed, so the elapsed time falls by up to a factor of
+2 * (depth + 1) while the number of getMaxLength calls rises.
+
+Probes run on a thread pool, or on a pool of worker processes owned by the
+finder. Each worker is given the oracle once, when it starts, and probes
+send only their intervals. A BufferOracle's target is copied once into a
+multiprocessing.shared_memory block, as in shard.py, rather than pickled, so
+targets held in memory maps can be searched too.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter_ns
+
+from findstring import FindString
+from oracle import BufferOracle
+
+# oracle of a worker process, installed by _install
+_oracle = None
+_shared = None  # SharedMemory block holding the target of a BufferOracle
+
+
+def _install(oracle, name=None, query=None, tlen=0):
+    """Install the oracle of a worker process, or a BufferOracle over the
+    first tlen bytes of the shared memory block name.
+    """
+    global _oracle, _shared
+    if name is not None:
+        _shared = SharedMemory(name=name)
+        oracle = BufferOracle(_shared.buf[:tlen], query)
+    _oracle = oracle
+
+
+def _probe(left, right):
+    return _oracle.getMaxLength(left, right)
+
+
+class SpeculativeFindString(FindString):
+    """FindString issuing probes speculatively on an executor. executor is a
+    concurrent.futures executor running threads, such as a ThreadPoolExecutor,
+    or the number of worker processes of a ProcessPoolExecutor to create,
+    each given the oracle once. Throws ValueError for a ProcessPoolExecutor,
+    which would be sent the oracle with every probe. Close the finder, or use
+    it as a context manager, to shut down its processes. The model
+    implementation of getMaxLength is replaced by a BufferOracle.
+    """
+
+    executor = None
+    depth = 1
+    pending = None    # futures for submitted probes, keyed by (left, right)
+    processes = None  # ProcessPoolExecutor owned by this finder, if any
+    shared = None     # SharedMemory block holding a BufferOracle's target
+
+    # probes go through _contains, so never bypass it
+    fast_path = False
+
+    def __init__(self, target, query, executor, depth=1, **kwargs):
+        if depth < 0:
+            raise ValueError("depth less than 0")
+        if isinstance(executor, ProcessPoolExecutor):
+            raise ValueError("give a number of processes, not a process pool")
+        if isinstance(executor, int) and executor < 1:
+            raise ValueError("processes less than 1")
+        super().__init__(target, query, **kwargs)
+        if self.oracle is self:
+            self.oracle = BufferOracle(target, query)
+        self.depth = depth
+        self.pending = {}
+        if isinstance(executor, int):
+            executor = self._start_processes(executor)
+        self.executor = executor
+
+    def _start_processes(self, count):
+        """Create a pool of count worker processes, each given the oracle
+        once.
+        """
+        initargs = (self.oracle,)
+        if type(self.oracle) is BufferOracle:
+            buffer = self.oracle.buffer
+            self.shared = SharedMemory(create=True, size=len(buffer))
+            self.shared.buf[:len(buffer)] = buffer
+            initargs = (None, self.shared.name, self.oracle.query,
+                        len(buffer))
+        self.processes = ProcessPoolExecutor(count, initializer=_install,
+                                             initargs=initargs)
+        return self.processes
+
+    def close(self):
+        """Shut down the worker processes and free the shared memory, if
+        any.
+        """
+        self._cancel_all()
+        if self.processes is not None:
+            self.processes.shutdown()
+            self.processes = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # search drivers
+
+    def _run(self, name, search, op, margin=None):
+        """See FindString._run. Cancels the probes still pending when the
+        search ends, however it ends.
+        """
+        try:
+            return super()._run(name, search, op, margin)
+        finally:
+            self._cancel_all()
+
+    # probes
+
+    def _submit(self, left, right):
+        """Submit a probe of (left, right) inclusive unless it is already
+        pending, and return its future.
+        """
+        key = (left, right)
+        future = self.pending.get(key)
+        if future is None:
+            if self.show_metrics:
+                self.metrics.update(left, right)
+            if self.processes is not None:
+                future = self.executor.submit(_probe, left, right)
+            else:
+                future = self.executor.submit(self.oracle.getMaxLength,
+                                              left, right)
+            self.pending[key] = future
+        return future
+
+    def _cancel(self, left, right):
+        """Cancel pending probes that lie outside (left, right) inclusive."""
+        for key in list(self.pending):
+            if key[0] < left or key[1] > right:
+                self.pending.pop(key).cancel()
+
+    def _cancel_all(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+
+    def _contains(self, left, right):
+        if self.cache is not None:
+            found = self.cache.lookup(left, right)
+            if self.show_metrics:
+                self.metrics.cached(found is not None)
+            if found is not None:
+                return found
+
+        # the answer is consumed once, so drop its future
+        future = self._submit(left, right)
+        del self.pending[(left, right)]
+        if self.show_metrics:
+            begin = perf_counter_ns()
+            found = future.result() >= self.qlen
+            self.metrics.timed(perf_counter_ns() - begin)
+        else:
+            found = future.result() >= self.qlen
+
+        if self.cache is not None:
+            self.cache.store(left, right, found)
+        return found
+
+    # speculation
+
+    def _step_binary(self, left, right):
+        self._speculate_binary(left, right, self.depth)
+
+    def _step_margin(self, left, right, margin):
+        self._speculate_margin(left, right, margin, self.depth)
+
+    def _narrow(self, left, right):
+        self._cancel(left, right)
+
+    def _speculate_binary(self, left, right, depth):
+        """Submit the probes _binary_find may make for segment (left, right),
+        and for the segments it may branch to down to depth further levels.
+        """
+        slen = right - left + 1
+        if slen < self.qlen:
+            return
+        if slen == self.qlen:
+            self._submit(left, right)
+            return
+
+        margin = slen//2
+        self._submit(left, right - margin)
+        self._submit(left + margin, right)
+        if depth > 0:
+            self._speculate_binary(left, right - margin, depth - 1)
+            self._speculate_binary(left + margin, right, depth - 1)
+
+    def _speculate_margin(self, left, right, margin, depth):
+        """Submit the probes _margin_find may make for segment (left, right)
+        with margin, and for the steps that may follow down to depth further
+        levels.
+        """
+        slen = right - left + 1
+        if slen < self.qlen:
+            return
+        if slen == self.qlen:
+            self._submit(left, right)
+            return
+
+        self._submit(left, right - margin)
+        self._submit(left + margin, right)
+        if depth > 0:
+            self._speculate_margin(left, right - margin, margin, depth - 1)
+            self._speculate_margin(left + margin, right, margin, depth - 1)
+            if margin > 1:
+                self._speculate_margin(left, right, margin//2, depth - 1)
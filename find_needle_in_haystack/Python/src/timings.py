@@ -1,3 +1,13 @@
+"""
+Timings
+
+Runs the original timing of binary_find and margin_find over 100 randomly
+placed queries in the full scale problem. See benchmark.py for timings over
+a range of scenarios, with machine-readable output.
+
+  python timings.py
+"""
+
 import random
 import sys
 
@@ -5,13 +15,20 @@ import sys
 from timeit import default_timer as timer
 
 from findstring import FindString
+from oracle import VirtualTarget
 
 REPEAT = 100
 
 
-def build_strings(tsize, qsize, qstart, marker='x'):
+def build_strings(tsize, qsize, qstart, marker='x', kind="list"):
     """Generate and return a pair of test strings for target and query using
-    the supplied lengths and query start position inside target.
+    the supplied lengths and query start position inside target. The kind of
+    target is one of:
+
+    - "list"      - a list of characters, with a list query
+    - "bytearray" - a bytearray, one byte per character, with a bytes query
+    - "virtual"   - a VirtualTarget described by the query run alone and
+                    never materialised, with a str query
     """
     if tsize < 1:
         print("ERROR: target size less than 1", file=sys.stderr)
@@ -25,10 +42,20 @@ def build_strings(tsize, qsize, qstart, marker='x'):
     if qstart < 0:
         print("ERROR: query start is negative", file=sys.stderr)
         return [], []
-    target, query = ['-'] * tsize, [marker] * qsize
-    for i in range(qstart, qstart + qsize):
-        target[i] = marker
-    return target, query
+    if kind == "list":
+        target, query = ['-'] * tsize, [marker] * qsize
+        target[qstart:qstart + qsize] = query
+        return target, query
+    if kind == "bytearray":
+        query = marker.encode("latin-1") * qsize
+        target = bytearray(b'-') * tsize
+        target[qstart:qstart + qsize] = query
+        return target, query
+    if kind == "virtual":
+        runs = [(qstart, qstart + qsize - 1)]
+        return VirtualTarget(tsize, runs, marker), marker * qsize
+    print("ERROR: unknown kind of target", kind, file=sys.stderr)
+    return [], []
 
 
 def test_massive_random_find():
@@ -57,4 +84,5 @@ def test_massive_random_find():
     print()
 
 
-test_massive_random_find()
+if __name__ == "__main__":
+    test_massive_random_find()
@@ -1,25 +1,108 @@
+import json
+import time
+
+from collections import deque
+
+
 class trace:
+    """
+    Records the stages of a search as (op, left, right, margin, t_ns) events
+    in a ring buffer holding the latest size events, where t_ns is from
+    time.perf_counter_ns(). Recording an event costs one tuple, so tracing
+    can stay on for targets of any size.
+
+    Events can be pretty printed, as they are recorded (live) or afterwards,
+    or dumped as JSON lines or in Chrome trace format (for chrome://tracing
+    or Perfetto). Pretty printing shows the target, so live printing is only
+    on by default for targets up to MAX_TRACE_WIDTH characters.
+    """
 
     MAX_TRACE_WIDTH = 80
+    DEFAULT_SIZE = 4096
 
     target = None
     tlen = None
     qlen = None
     marker = None
+    events = None  # ring buffer of (op, left, right, margin, t_ns)
+    dropped = 0    # number of events pushed out of the ring buffer
+    live = False   # pretty print events as they are recorded
 
-    def __init__(self, finder):
-        self.target = finder.target
+    def __init__(self, finder, size=DEFAULT_SIZE, live=None):
+        if size < 1:
+            raise ValueError("trace size less than 1")
         self.tlen = finder.tlen
         self.qlen = finder.qlen
         self.marker = finder.query_string[0]
-
-    def print(self, text, left, right, margin=None):
-        if self.tlen > self.MAX_TRACE_WIDTH:
-            return
-        self._pretty_print(text, left, right, margin)
+        if self.tlen <= self.MAX_TRACE_WIDTH:
+            self.target = self._text(finder.target)
+        self.events = deque(maxlen=size)
+        self.dropped = 0
+        self.live = self.target is not None if live is None else live
+
+    @staticmethod
+    def _text(target):
+        """Return target as a str, decoding bytes-like targets."""
+        if isinstance(target, str):
+            return target
+        try:
+            return bytes(target).decode("latin-1")
+        except TypeError:  # a sequence of characters
+            return "".join(target)
+
+    def record(self, op, left, right, margin=None):
+        """Record an event, pretty printing it if live."""
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append((op, left, right, margin, time.perf_counter_ns()))
+        if self.live:
+            self._pretty_print(op, left, right, margin)
+
+    def clear(self):
+        self.events.clear()
+        self.dropped = 0
+
+    # renderers
+
+    def print(self):
+        """Pretty print the recorded events."""
+        for op, left, right, margin, _ in self.events:
+            self._pretty_print(op, left, right, margin)
+
+    def dump_jsonl(self, out):
+        """Write the recorded events to the file out as JSON lines.
+
+        Example:
+
+          {"op": "mf bl", "left": 0, "right": 5, "margin": 2, "t_ns": 1234}
+        """
+        for op, left, right, margin, t_ns in self.events:
+            out.write(json.dumps({"op": op, "left": left, "right": right,
+                                  "margin": margin, "t_ns": t_ns}) + "\n")
+
+    def dump_chrome(self, out, pid=0, tid=0):
+        """Write the recorded events to the file out in Chrome trace event
+        format, as instant events with a counter tracking the length of the
+        search segment.
+        """
+        events = []
+        for op, left, right, margin, t_ns in self.events:
+            ts = t_ns / 1000  # microseconds
+            args = {"left": left, "right": right}
+            if margin is not None:
+                args["margin"] = margin
+            events.append({"name": op, "ph": "i", "s": "t", "ts": ts,
+                           "pid": pid, "tid": tid, "args": args})
+            events.append({"name": "segment", "ph": "C", "ts": ts,
+                           "pid": pid, "tid": tid,
+                           "args": {"slen": right - left + 1}})
+        json.dump({"traceEvents": events, "displayTimeUnit": "ns",
+                   "otherData": {"tlen": self.tlen, "qlen": self.qlen,
+                                 "dropped": self.dropped}}, out)
 
     def _pretty_print(self, text, left, right, margin):
-        """Pretty print a stage of a search on one line.
+        """Pretty print a stage of a search on one line, showing the target
+        if it is no more than MAX_TRACE_WIDTH characters.
 
         Example after repeated calls:
 
@@ -29,6 +112,10 @@ class trace:
           mf br  ..[xxxx]..  8/4 (2, 5) margin 2
           mf >>  ..[xxxx]..  8/4 (2, 5)
 
+        and for a longer target:
+
+          mf bl  1048576/8192 (0, 524287) margin 524288
+
         Key:
 
           [xxxx--] the query 'xxxx' with brackets showing the margins of the
@@ -37,28 +124,38 @@ class trace:
           nf = naive_find
           bf = binary_find
           mf = margin_find
+          sf = start_find
+          cf = cost_find
+          fa = find_all
 
           in = enter function
           bl = branch left
           br = branch right
           sh = shrink margin by 2
+          ee = return no match
           >> = return solution
         """
 
-        prefix = self.target[0:left]
-        middle = self.target[left:right + 1]
-        suffix = self.target[right + 1:self.tlen]
         out = ""
 
-        if left != 0:
-            out += "".join(prefix).replace('-', '.').replace(self.marker, '*')
+        if self.target is not None:
+            prefix = self.target[0:left]
+            middle = self.target[left:right + 1]
+            suffix = self.target[right + 1:self.tlen]
+
+            if left != 0:
+                out += "".join(prefix).replace('-', '.') \
+                    .replace(self.marker, '*')
+
+            out += '[' + "".join(middle) + ']'
 
-        out += '[' + "".join(middle) + ']'
+            if right != self.tlen - 1:
+                out += "".join(suffix).replace('-', '.') \
+                    .replace(self.marker, '*')
 
-        if right != self.tlen - 1:
-            out += "".join(suffix).replace('-', '.').replace(self.marker, '*')
+            out += "  "
 
-        out = "%s  %s  %d/%d (%d, %d)" % \
+        out = "%s  %s%d/%d (%d, %d)" % \
             (text, out, self.tlen, self.qlen, left, right)
 
         out += " margin %d" % margin if margin is not None else ""
@@ -0,0 +1,178 @@
+import asyncio
+import pytest
+import random
+import time
+
+from asyncfindstring import AsyncFindString, find_many
+from costmodel import CostModel
+from findstring import FindString
+from oracle import BufferOracle, RunLengthOracle
+
+from test.findstring_test import all_runs, build_strings, EVEN_TESTS, \
+    ODD_TESTS
+
+"""
+Tests AsyncFindString against an in-process stand-in for a remote oracle,
+with injected latency.
+
+Examples:
+
+  pytest -v test/asyncfindstring_test.py
+"""
+
+
+class LatentOracle(BufferOracle):
+    """A BufferOracle whose getMaxLength is a coroutine taking latency
+    seconds, recording the greatest number of calls in flight at once.
+    """
+
+    latency = 0.0
+    active = 0
+    peak = 0
+
+    def __init__(self, target, query, latency=0.0):
+        super().__init__(target, query)
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+
+    async def getMaxLength(self, startPosition, endPosition):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            return super().getMaxLength(startPosition, endPosition)
+        finally:
+            self.active -= 1
+
+
+METHODS = ["naive_find", "binary_find", "margin_find", "start_find",
+           "cost_find"]
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_async_find(method, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = AsyncFindString(target, query, trace=True, metrics=True,
+                                 oracle=LatentOracle(target, query))
+        result = asyncio.run(getattr(finder, method)())
+        assert result == (start, start + qlen - 1)
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_async_find_with_model_oracle(method):
+    target, query = build_strings(64, 4, 33)
+    finder = AsyncFindString(target, query)
+    assert asyncio.run(getattr(finder, method)()) == (33, 36)
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_async_find_without_match(method):
+    finder = AsyncFindString(['-'] * 64, ['x'] * 4)
+    assert asyncio.run(getattr(finder, method)()) == FindString.NO_MATCH
+
+
+@pytest.mark.parametrize('method', METHODS + ["find_all"])
+def test_async_search_matches_findstring(method):
+    # the searches are FindString's own, so they make the same probes and
+    # record the same trace events
+    target, query = build_strings(96, 5, 61)
+    finder = FindString(target, query, trace=True)
+    async_finder = AsyncFindString(target, query, trace=True,
+                                   oracle=LatentOracle(target, query))
+    assert asyncio.run(getattr(async_finder, method)()) == \
+        getattr(finder, method)()
+    assert [event[:4] for event in async_finder.trace.events] == \
+        [event[:4] for event in finder.trace.events]
+
+
+def test_async_cost_find_with_model():
+    target, query = build_strings(64, 4, 10)
+    finder = AsyncFindString(target, query,
+                             oracle=LatentOracle(target, query))
+    model = CostModel(per_call=1.0, per_char=0.5)
+    assert asyncio.run(finder.cost_find(model)) == (10, 13)
+
+
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_async_find_all(tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = AsyncFindString(target, query, metrics=True,
+                                 oracle=LatentOracle(target, query))
+        assert asyncio.run(finder.find_all()) == [(start, start + qlen - 1)]
+    finder = AsyncFindString(['-'] * tlen, ['x'] * qlen)
+    assert asyncio.run(finder.find_all()) == []
+
+
+def test_async_find_all_runs():
+    rand = random.Random(15)
+    for _ in range(100):
+        tlen = rand.randint(1, 60)
+        target = [rand.choice('xx--') for _ in range(tlen)]
+        query = ['x'] * rand.randint(1, min(tlen, 4))
+        finder = AsyncFindString(target, query,
+                                 oracle=LatentOracle(target, query))
+        assert asyncio.run(finder.find_all()) == all_runs(target, query)
+
+
+def test_async_find_all_with_longest_run_oracle():
+    target = list('--xxxx----xxxxxx--')
+    finder = AsyncFindString(target, list('xxxx'),
+                             oracle=RunLengthOracle(target, 'xxxx'))
+    assert asyncio.run(finder.find_all()) == [(2, 5), (10, 15)]
+
+
+def test_many_searches_on_one_event_loop():
+    tlen, qlen, count, latency = 2**12, 2**6, 1000, 0.01
+    rand = random.Random(6)
+    starts = [rand.randint(0, tlen - qlen) for _ in range(count)]
+    finders = []
+    for start in starts:
+        target, query = build_strings(tlen, qlen, start)
+        oracle = LatentOracle(bytes("".join(target), "latin-1"), query,
+                              latency)
+        finders.append(AsyncFindString(target, query, oracle=oracle))
+
+    begin = time.perf_counter()
+    results = asyncio.run(find_many(finders))
+    elapsed = time.perf_counter() - begin
+
+    assert results == [(start, start + qlen - 1) for start in starts]
+    # each search makes tens of calls, so one after another would take
+    # count * tens * latency seconds
+    assert elapsed < count * latency
+
+
+def test_limit_bounds_probes_in_flight():
+    tlen, qlen, limit = 2**10, 2**4, 3
+    target, query = build_strings(tlen, qlen, 100)
+    oracle = LatentOracle(target, query, 0.001)
+
+    async def run():
+        semaphore = asyncio.Semaphore(limit)
+        finders = [AsyncFindString(target, query, oracle=oracle,
+                                   limit=semaphore)
+                   for _ in range(20)]
+        return await find_many(finders, "margin_find")
+
+    assert asyncio.run(run()) == [(100, 100 + qlen - 1)] * 20
+    assert oracle.peak == limit
+
+
+def test_positional_arguments_match_findstring():
+    target, query = build_strings(64, 4, 10)
+    finder = AsyncFindString(target, query, True, True)
+    assert finder.show_trace and finder.show_metrics
+    assert finder.oracle is finder
+
+
+def test_probe_timeout_raises():
+    target, query = build_strings(64, 4, 10)
+    finder = AsyncFindString(target, query,
+                             oracle=LatentOracle(target, query, 1.0),
+                             timeout=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(finder.binary_find())
@@ -0,0 +1,107 @@
+import pytest
+import random
+
+from batchfinder import BatchFinder
+from findstring import FindString
+from oracle import RunLengthOracle
+from probecache import ProbeCache
+
+"""
+Tests BatchFinder answering batches of queries over one shared target, with
+each search method and oracle.
+
+Examples:
+
+  pytest -v test/batchfinder_test.py
+"""
+
+
+def build_batch(tsize, needles, rand):
+    """Return a target of length tsize containing one run of each marker in
+    needles (a dict of marker to run length), at random non-overlapping
+    positions, and a dict of marker to the (start, stop) of its run.
+    """
+    target, expect = ['-'] * tsize, {}
+    slot = tsize // len(needles)
+    for i, (marker, qsize) in enumerate(sorted(needles.items())):
+        start = i * slot + rand.randint(0, slot - qsize)
+        target[start:start + qsize] = [marker] * qsize
+        expect[marker] = (start, start + qsize - 1)
+    return target, expect
+
+
+@pytest.mark.parametrize('method', [
+    FindString.naive_find, FindString.binary_find, FindString.margin_find])
+@pytest.mark.parametrize('oracle', [None, RunLengthOracle])
+def test_find_many(method, oracle):
+    rand = random.Random(3)
+    needles = {marker: rand.randint(1, 20) for marker in 'abcdefgh'}
+    target, expect = build_batch(2**10, needles, rand)
+    finder = BatchFinder(target) if oracle is None \
+        else BatchFinder(target, oracle)
+
+    queries = [marker * needles[marker] for marker in needles] * 3 + ['zz']
+    results = finder.find_many(queries, method)
+
+    assert results == [expect[query[0]] for query in queries[:-1]] + \
+        [FindString.NO_MATCH]
+    assert finder.queries == len(queries)
+    assert finder.throughput() > 0
+    finder.print()
+
+
+def test_repeated_queries_share_probe_results():
+    rand = random.Random(4)
+    target, expect = build_batch(2**12, {'a': 16}, rand)
+    finder = BatchFinder(target, cache=ProbeCache.DEFAULT_SIZE)
+    finder.find_many(['a' * 16])
+    cache = finder.finder('a' * 16).cache
+    misses = cache.misses
+
+    assert finder.find_many(['a' * 16] * 10) == [expect['a']] * 10
+    assert cache.misses == misses
+    assert cache.hits > 0
+    assert len(finder.finders) == 1
+
+
+def test_no_cache_by_default():
+    finder = BatchFinder('--xx--')
+    assert finder.find_many(['xx']) == [(2, 3)]
+    assert finder.finder('xx').cache is None
+    assert finder.finder('xx')._fast()
+
+
+def test_bad_queries_raise():
+    finder = BatchFinder('--xx--')
+    with pytest.raises(ValueError):
+        finder.find_many([''])
+    with pytest.raises(ValueError):
+        finder.find_many(['x' * 7])
+    with pytest.raises(ValueError):
+        BatchFinder('')
+
+
+def test_run_index_shared_by_query_character():
+    rand = random.Random(5)
+    target, expect = build_batch(2**10, {'a': 16, 'b': 8}, rand)
+    finder = BatchFinder(target, RunLengthOracle)
+    queries = ['a' * qlen for qlen in range(1, 17)] + ['b' * 8, 'b' * 4]
+
+    results = finder.find_many(queries, FindString.start_find)
+
+    assert results[15] == expect['a'] and results[16] == expect['b']
+    assert sorted(finder.oracles) == [b'a', b'b']
+    assert finder.finder('a').oracle is finder.finder('a' * 16).oracle
+
+
+def test_finders_are_bounded():
+    finder = BatchFinder('-' * 64 + 'x' * 8, RunLengthOracle, size=4)
+    for qlen in range(1, 9):
+        [(start, stop)] = finder.find_many(['x' * qlen])
+        assert 64 <= start and stop == start + qlen - 1 < 72
+    assert list(finder.finders) == [b'x' * qlen for qlen in range(5, 9)]
+    finder.finder('x' * 5)
+    finder.finder('x')
+    assert list(finder.finders) == [b'x' * qlen for qlen in (7, 8, 5, 1)]
+    with pytest.raises(ValueError):
+        BatchFinder('--xx--', size=0)
@@ -0,0 +1,68 @@
+import copy
+import json
+
+import benchmark
+
+"""
+Tests the benchmark harness on a small grid of scenarios.
+
+Examples:
+
+  pytest -v test/benchmark_test.py
+"""
+
+
+def small_run(*argv):
+    args = benchmark.parse_args(["--min-exp", "8", "--max-exp", "10",
+                                 "--step", "2", "--repeat", "3", *argv])
+    return benchmark.run(args)
+
+
+def test_benchmark_covers_grid():
+    report = small_run()
+    results = report["results"]
+    # 2 sizes x 2 shifts x 3 oracles x 5 methods x 4 positions
+    assert len(results) == 2 * 2 * 3 * 5 * 4
+    assert {result["method"] for result in results} == set(benchmark.METHODS)
+    assert {result["oracle"] for result in results} == set(benchmark.ORACLES)
+    for result in results:
+        seconds = result["seconds"]
+        assert 0 < seconds["min"] <= seconds["p50"] <= seconds["p90"] \
+            <= seconds["p99"] <= seconds["max"]
+        assert result["funcalls"] > 0
+        assert result["targetsum"] >= result["qlen"]
+    json.dumps(report)
+
+
+def test_benchmark_skips_oversized_scenarios():
+    args = benchmark.parse_args(["--min-exp", "16", "--max-exp", "22",
+                                 "--step", "6", "--shifts", "7"])
+    found = {(method, oracle, tlen)
+             for method, oracle, tlen, _, _ in benchmark.scenarios(args)}
+    assert ("naive_find", "buffer", 2**16) in found
+    assert ("naive_find", "buffer", 2**22) not in found
+    assert ("binary_find", "model", 2**22) not in found
+    assert ("binary_find", "buffer", 2**22) in found
+
+
+def test_regressions_reports_slower_or_more_calls():
+    baseline = small_run("--methods", "binary_find", "--oracles", "buffer")
+    assert benchmark.regressions(baseline, baseline, 1.25) == []
+
+    report = copy.deepcopy(baseline)
+    report["results"][0]["seconds"]["min"] *= 2
+    report["results"][1]["funcalls"] += 1
+    messages = benchmark.regressions(report, baseline, 1.25)
+    assert len(messages) == 2
+    assert "min" in messages[0] and "funcalls" in messages[1]
+
+
+def test_main_writes_json(tmp_path):
+    output = tmp_path / "bench.json"
+    argv = ["--min-exp", "8", "--max-exp", "8", "--repeat", "2",
+            "--methods", "start_find", "--output", str(output)]
+    assert benchmark.main(argv) == 0
+    report = json.loads(output.read_text())
+    assert len(report["results"]) == 2 * 3 * 4
+    assert benchmark.main(argv + ["--baseline", str(output),
+                                  "--tolerance", "1000"]) == 0
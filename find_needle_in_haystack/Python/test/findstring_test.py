@@ -1,15 +1,20 @@
+import contextlib
+import io
+import math
 import pytest
 import random
 import sys
 
+from costmodel import CostModel
 from findstring import FindString
+from oracle import BufferOracle, RunLengthOracle, VirtualTarget
 
 """
-Tests all three solutions exhaustively over a range of short even and odd
+Tests all five solutions exhaustively over a range of short even and odd
 sized target and query sequences.
 
-Tests the full scale problem with binary_find and margin_find using randomly
-generated target/query pairs.
+Tests the full scale problem with binary_find, margin_find and start_find
+using randomly generated target/query pairs.
 
   pytest --setup-plan
 
@@ -129,6 +134,228 @@ def test_margin_find_in_odd_length_target(tlen, qlen):
         run_one_find(FindString.margin_find, tlen, qlen, start)
 
 
+# start_find
+
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS)
+def test_start_find_in_even_length_target(tlen, qlen):
+    print("\n\nstart_find, binary search of start positions")
+    for start in range(tlen - qlen + 1):
+        run_one_find(FindString.start_find, tlen, qlen, start)
+
+
+@pytest.mark.parametrize(['tlen', 'qlen'], ODD_TESTS)
+def test_start_find_in_odd_length_target(tlen, qlen):
+    print("\n\nstart_find, binary search of start positions")
+    for start in range(tlen - qlen + 1):
+        run_one_find(FindString.start_find, tlen, qlen, start)
+
+
+@pytest.mark.parametrize(['tlen', 'qlen'], [(64, 1), (64, 5), (100, 7),
+                                            (128, 32), (129, 32)])
+def test_start_find_call_bound(tlen, qlen):
+    # ceil(log2(tlen - qlen + 1)) + 1 <= log2(tlen/qlen) + log2(qlen) + 2
+    bound = math.ceil(math.log2(tlen - qlen + 1)) + 1
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString(target, query, metrics=True)
+        assert finder.start_find() == (start, start + qlen - 1)
+        assert finder.metrics.calls <= bound
+
+
+# start_find, random massive target/query
+
+@pytest.mark.random
+def test_massive_random_start_find():
+    print("\n\nmassive random start_find")
+    tlen, qlen = 2**20, 2**13
+    for _ in range(10):
+        start = random.randint(0, tlen - qlen)
+        run_one_find(FindString.start_find, tlen,
+                     qlen, start, trace=False, metrics=True)
+
+
+# cost_find
+
+MODELS = [CostModel(), CostModel(0, 1), CostModel(100, 1), CostModel(1, 100)]
+
+
+@pytest.mark.parametrize('model', MODELS)
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_cost_find(model, tlen, qlen):
+    print("\n\ncost_find, cost minimising search of start positions")
+    for start in range(tlen - qlen + 1):
+        run_one_find(lambda finder: finder.cost_find(model), tlen, qlen,
+                     start)
+
+
+def test_cost_model_split_halves_when_only_calls_cost():
+    model = CostModel()
+    for candidates in range(2, 1000):
+        assert model.split(candidates, 8) == candidates//2
+
+
+def test_cost_model_rejects_bad_costs():
+    with pytest.raises(ValueError):
+        CostModel(-1, 0)
+    with pytest.raises(ValueError):
+        CostModel(0, 0)
+
+
+@pytest.mark.parametrize('model', MODELS[1:])
+def test_cost_find_reduces_cost(model):
+    tlen, qlen = 2**16, 2**9
+    rand = random.Random(8)
+    costs = {"start_find": 0, "cost_find": 0}
+    for _ in range(20):
+        start = rand.randint(0, tlen - qlen)
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString("".join(target).encode(), query, metrics=True)
+        assert finder.start_find() == (start, start + qlen - 1)
+        costs["start_find"] += model.cost(finder.metrics.calls,
+                                          finder.metrics.cumlen)
+        assert finder.cost_find(model) == (start, start + qlen - 1)
+        costs["cost_find"] += model.cost(finder.metrics.calls,
+                                         finder.metrics.cumlen)
+    assert costs["cost_find"] < costs["start_find"]
+
+
+# find_all
+
+def all_runs(target, query):
+    """Return the maximal runs of query at consecutive start positions in
+    target, by a linear scan.
+    """
+    runs = []
+    qlen = len(query)
+    for start in range(len(target) - qlen + 1):
+        if target[start:start + qlen] == query:
+            if runs and runs[-1][1] == start + qlen - 2:
+                runs[-1] = (runs[-1][0], start + qlen - 1)
+            else:
+                runs.append((start, start + qlen - 1))
+    return runs
+
+
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_all_with_one_query(tlen, qlen):
+    print("\n\nfind_all, binary searches over start positions")
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString(target, query, trace=True, metrics=True)
+        assert finder.find_all() == [(start, start + qlen - 1)]
+
+
+def test_find_all_runs():
+    rand = random.Random(15)
+    for _ in range(200):
+        tlen = rand.randint(1, 60)
+        target = [rand.choice('xx--') for _ in range(tlen)]
+        query = ['x'] * rand.randint(1, min(tlen, 4))
+        finder = FindString(target, query, metrics=True)
+        assert finder.find_all() == all_runs(target, query)
+
+
+def test_find_all_call_bound():
+    tlen, qlen = 2**16, 2**4
+    rand = random.Random(16)
+    for count in (1, 2, 5, 20):
+        target = ['-'] * tlen
+        for start in rand.sample(range(0, tlen - qlen, 2 * qlen), count):
+            target[start:start + qlen] = ['x'] * qlen
+        finder = FindString(target, ['x'] * qlen, metrics=True)
+        runs = finder.find_all()
+        assert len(runs) == count
+        candidates = tlen - qlen + 1
+        assert finder.metrics.calls <= \
+            1 + count * (math.ceil(math.log2(candidates)) + 2)
+
+
+@pytest.mark.parametrize('extra', [0, 1, 100, 4000, 3 * 2**13 + 5])
+def test_find_all_long_run_call_bound(extra):
+    tlen, qlen, start = 2**20, 2**13, 300000
+    target = bytearray(b'-') * tlen
+    target[start:start + qlen + extra] = b'x' * (qlen + extra)
+    finder = FindString(target, b'x' * qlen, metrics=True)
+    assert finder.find_all() == [(start, start + qlen + extra - 1)]
+    candidates = tlen - qlen + 1
+    assert finder.metrics.calls <= 2 + math.ceil(math.log2(candidates)) + \
+        2 * math.ceil(math.log2(qlen + 1)) + math.ceil(extra / qlen)
+
+
+def test_find_all_with_longest_run_oracles():
+    target = list('--xxxx----xxxxxx--')
+    oracle = RunLengthOracle(target, 'xxxx')
+    finder = FindString(target, list('xxxx'), oracle=oracle)
+    assert finder.find_all() == [(2, 5), (10, 15)]
+
+    virtual = VirtualTarget(2**20, [(100, 107), (5000, 5020), (9000, 9006)])
+    finder = FindString(virtual, 'x' * 8, oracle=virtual.oracle(8))
+    assert finder.find_all() == [(100, 107), (5000, 5020)]
+
+
+# no match
+
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_in_target_without_query(tlen, qlen):
+    print("\n\nno match, query is absent")
+    target, query = ['-'] * tlen, ['x'] * qlen
+    finder = FindString(target, query, trace=True, metrics=True)
+    assert finder.naive_find() == FindString.NO_MATCH
+    assert finder.binary_find() == FindString.NO_MATCH
+    assert finder.margin_find() == FindString.NO_MATCH
+    assert finder.start_find() == FindString.NO_MATCH
+    assert finder.cost_find(CostModel(0, 1)) == FindString.NO_MATCH
+    assert finder.find_all() == []
+
+
+# fast path, taken without trace, metrics or cache
+
+@pytest.mark.parametrize('method', [FindString.binary_find,
+                                    FindString.margin_find])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_fast_path(method, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        run_one_find(method, tlen, qlen, start, trace=False, metrics=False)
+    finder = FindString(['-'] * tlen, ['x'] * qlen)
+    assert method(finder) == FindString.NO_MATCH
+
+
+class RecordingOracle(BufferOracle):
+    """A BufferOracle recording the intervals of its getMaxLength calls."""
+
+    def __init__(self, target, query):
+        super().__init__(target, query)
+        self.calls = []
+
+    def getMaxLength(self, startPosition, endPosition):
+        self.calls.append((startPosition, endPosition))
+        return super().getMaxLength(startPosition, endPosition)
+
+
+def test_fast_path_makes_the_same_calls():
+    tlen, qlen = 2**12, 2**5
+    for start in range(0, tlen - qlen + 1, 37):
+        target, query = build_strings(tlen, qlen, start)
+        for method in (FindString.binary_find, FindString.margin_find):
+            oracle = RecordingOracle(target, query)
+            finder = FindString(target, query, oracle=oracle)
+            assert method(finder) == (start, start + qlen - 1)
+            fast, oracle.calls = oracle.calls, []
+            finder.show_metrics = True
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert method(finder) == (start, start + qlen - 1)
+            assert oracle.calls == fast
+
+
+def test_deep_binary_find():
+    tlen, qlen, start = 2**26, 2**6, 2**26 - 2**20 - 3
+    target = bytearray(tlen)
+    target[start:start + qlen] = b'x' * qlen
+    finder = FindString(target, b'x' * qlen)
+    assert finder.binary_find() == (start, start + qlen - 1)
+    assert finder.margin_find() == (start, start + qlen - 1)
+
+
 # margin_find, random massive target/query
 
 @pytest.mark.random
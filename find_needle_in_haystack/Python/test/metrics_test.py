@@ -0,0 +1,112 @@
+import contextlib
+import io
+import random
+
+from findstring import FindString
+from metrics import histogram, metrics
+
+from test.findstring_test import build_strings
+
+"""
+Tests latency histograms and the export and aggregation of metrics.
+
+Examples:
+
+  pytest -v test/metrics_test.py
+"""
+
+
+def quiet(search):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return search()
+
+
+def test_histogram_percentiles_within_precision():
+    rand = random.Random(13)
+    values = sorted(rand.randint(0, 10**7) for _ in range(10000))
+    times = histogram()
+    for value in values:
+        times.record(value)
+    assert times.count == len(values) and times.total == sum(values)
+    assert (times.min, times.max) == (values[0], values[-1])
+    for percent in (1, 50, 90, 99, 99.9):
+        exact = values[max(int(percent * len(values) / 100), 1) - 1]
+        assert exact <= times.percentile(percent) <= \
+            exact * (1 + 2**-(histogram.SUB_BITS - 1))
+    assert times.percentile(100) == values[-1]
+    assert histogram().percentile(50) == 0
+
+
+def test_histogram_small_values_are_exact():
+    times = histogram()
+    for value in range(16):
+        times.record(value)
+    assert len(times.counts) == 16
+    assert times.cumulative([15, 31]) == [16, 16]
+
+
+def test_histogram_merge():
+    one, two, both = histogram(), histogram(), histogram()
+    for value in range(0, 1000, 7):
+        one.record(value)
+        both.record(value)
+    for value in range(5000, 90000, 13):
+        two.record(value)
+        both.record(value)
+    one.merge(two)
+    assert one.as_dict() == both.as_dict()
+    assert one.counts == both.counts
+
+
+def test_probes_timed_by_phase():
+    target, query = build_strings(2**12, 2**4, 1234)
+    finder = FindString(target, query, metrics=True)
+    assert quiet(finder.binary_find) == (1234, 1249)
+    found = finder.metrics
+    assert found.latency.count == found.calls
+    assert sum(times.count for times in found.phases.values()) == found.calls
+    assert found.pending == []
+    assert {"bf ce", "mf >>"} <= set(found.phases)
+    assert all(op[:2] in ("bf", "mf") for op in found.phases)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        found.print_latency()
+    assert output.getvalue().splitlines()[1].split()[:2] == \
+        ["all", str(found.calls)]
+
+
+def test_aggregate_across_searches():
+    tlen, qlen = 2**10, 2**3
+    searches = []
+    for start in range(0, tlen - qlen, 97):
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString(target, query, metrics=True, cache=True)
+        quiet(finder.margin_find)
+        quiet(finder.margin_find)  # answered by the cache
+        searches.append(finder.metrics)
+    total = metrics.aggregate(searches, "margin_find")
+    assert total.calls == sum(found.calls for found in searches)
+    assert total.hits == sum(found.hits for found in searches) > 0
+    assert total.latency.count == total.calls
+    exported = total.as_dict()
+    assert exported["funcalls"] == total.calls
+    assert exported["latency_ns"]["count"] == total.calls
+    assert set(exported["phases"]) == set(total.phases)
+
+
+def test_prometheus_text():
+    target, query = build_strings(2**10, 2**3, 700)
+    finder = FindString(target, query, metrics=True)
+    quiet(finder.margin_find)
+    text = finder.metrics.prometheus()
+    lines = text.splitlines()
+    assert 'findstring_funcalls_total{method="margin_find"} %d' % \
+        finder.metrics.calls in lines
+    assert 'findstring_probe_seconds_count{method="margin_find"} %d' % \
+        finder.metrics.calls in lines
+    buckets = [int(line.split()[-1]) for line in lines
+               if line.startswith('findstring_probe_seconds_bucket'
+                                  '{method="margin_find",le=')]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == finder.metrics.calls
+    assert 'phase="mf >>"' in text
@@ -0,0 +1,80 @@
+import pytest
+import random
+
+from findstring import FindString
+
+from test.findstring_test import build_strings, EVEN_TESTS, ODD_TESTS
+from test.oracle_test import all_intervals, longest_run, to_bytes
+
+np = pytest.importorskip("numpy")
+
+from numpyoracle import NumpyOracle, simulate, start_find_many  # noqa: E402
+
+"""
+Tests NumpyOracle against a direct count of runs, and start_find_many
+against FindString.start_find. Skipped if numpy is not installed.
+
+Examples:
+
+  pytest -v test/numpyoracle_test.py
+"""
+
+
+def test_numpy_oracle_returns_longest_run():
+    rand = random.Random(14)
+    for _ in range(50):
+        tlen = rand.randint(1, 40)
+        target = [rand.choice('x--') for _ in range(tlen)]
+        intervals = list(all_intervals(tlen))
+        lefts = [left for left, _ in intervals]
+        rights = [right for _, right in intervals]
+        expect = [longest_run(target, 'x', left, right)
+                  for left, right in intervals]
+        for oracle in (NumpyOracle(target, 'x'),
+                       NumpyOracle(to_bytes(target), b'x')):
+            assert oracle.getMaxLengths(lefts, rights).tolist() == expect
+            assert [oracle.getMaxLength(left, right)
+                    for left, right in intervals] == expect
+
+
+def test_numpy_oracle_without_runs():
+    oracle = NumpyOracle(b'-' * 16, b'x')
+    assert oracle.getMaxLengths([0, 3], [15, 3]).tolist() == [0, 0]
+
+
+@pytest.mark.parametrize('method', [
+    FindString.binary_find, FindString.margin_find, FindString.start_find])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_with_numpy_oracle(method, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString(target, query, oracle=NumpyOracle(target, query))
+        assert method(finder) == (start, start + qlen - 1)
+
+
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_start_find_many_matches_start_find(tlen, qlen):
+    """Searches each segment of a target made of one build_strings target
+    per start position, laid end to end, plus one without the query.
+    """
+    targets = [build_strings(tlen, qlen, start)[0]
+               for start in range(tlen - qlen + 1)] + [['-'] * tlen]
+    oracle = NumpyOracle(sum(targets, []), ['x'] * qlen)
+    offsets = np.arange(len(targets)) * tlen
+    lefts, rights, calls, cumlen = start_find_many(oracle, qlen, offsets,
+                                                   offsets + tlen - 1)
+    for i, target in enumerate(targets):
+        finder = FindString(target, ['x'] * qlen, metrics=True)
+        left, right = finder.start_find()
+        if left != -1:
+            left, right = left + offsets[i], right + offsets[i]
+        assert (lefts[i], rights[i]) == (left, right)
+        assert (calls[i], cumlen[i]) == (finder.metrics.calls,
+                                         finder.metrics.cumlen)
+
+
+def test_simulate_many_searches():
+    tlen, qlen, count = 2**20, 2**13, 10000
+    starts, lefts, rights, calls, cumlen = simulate(tlen, qlen, count, 14)
+    assert (lefts == starts).all() and (rights == starts + qlen - 1).all()
+    assert calls.max() <= 21
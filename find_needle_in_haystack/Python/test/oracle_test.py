@@ -0,0 +1,230 @@
+import mmap
+import pytest
+import random
+
+from findstring import FindString
+from oracle import BufferOracle, RunLengthOracle, VirtualTarget, \
+    map_chunks, map_file
+from timings import build_strings as build_targets
+
+from test.findstring_test import build_strings, EVEN_TESTS, ODD_TESTS
+
+"""
+Tests the oracles in oracle.py against the FindString model implementation
+of getMaxLength, and all three search methods using oracle backed targets.
+
+Examples:
+
+  pytest -v test/oracle_test.py
+"""
+
+
+def to_bytes(target):
+    return "".join(target).encode("latin-1")
+
+
+def to_mmap(target):
+    data = to_bytes(target)
+    buffer = mmap.mmap(-1, len(data))
+    buffer.write(data)
+    return buffer
+
+
+# target conversions for the buffer oracle
+BUFFERS = [
+    to_bytes,
+    lambda target: bytearray(to_bytes(target)),
+    lambda target: memoryview(to_bytes(target)),
+    to_mmap,
+]
+
+
+def all_intervals(tlen):
+    for left in range(tlen):
+        for right in range(left, tlen):
+            yield left, right
+
+
+def longest_run(target, marker, left, right):
+    """Return the longest run of marker in target[left:right+1]."""
+    best = run = 0
+    for char in target[left:right + 1]:
+        run = run + 1 if char == marker else 0
+        best = max(best, run)
+    return best
+
+
+# buffer oracle
+
+@pytest.mark.parametrize('convert', BUFFERS)
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_buffer_oracle_agrees_with_model(convert, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        model = FindString(target, query)
+        oracle = BufferOracle(convert(target), query)
+        for left, right in all_intervals(tlen):
+            assert oracle.getMaxLength(left, right) == \
+                model.getMaxLength(left, right)
+
+
+def test_buffer_oracle_does_not_copy_target():
+    data = bytearray(to_bytes(build_strings(8, 4, 2)[0]))
+    assert BufferOracle(data, "xxxx").buffer is data
+    assert BufferOracle(memoryview(data), "xxxx").buffer is data
+
+
+@pytest.mark.parametrize('method', [
+    FindString.naive_find, FindString.binary_find, FindString.margin_find])
+@pytest.mark.parametrize('convert', BUFFERS)
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_in_buffer_target(method, convert, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString(convert(target), query, trace=True, metrics=True)
+        assert isinstance(finder.oracle, BufferOracle)
+        assert method(finder) == (start, start + qlen - 1)
+
+
+def test_find_with_supplied_oracle():
+    target, query = build_strings(2**12, 2**5, 1000)
+    oracle = BufferOracle(target, query)
+    finder = FindString(target, query, oracle=oracle)
+    assert finder.oracle is oracle
+    assert finder.binary_find() == (1000, 1000 + 2**5 - 1)
+
+
+# run length oracle
+
+def test_run_length_oracle_returns_longest_run():
+    rand = random.Random(2)
+    for _ in range(50):
+        tlen = rand.randint(1, 40)
+        target = [rand.choice('x--') for _ in range(tlen)]
+        oracle = RunLengthOracle(target, 'x')
+        buffered = RunLengthOracle(to_bytes(target), b'x')
+        for left, right in all_intervals(tlen):
+            expect = longest_run(target, 'x', left, right)
+            assert oracle.getMaxLength(left, right) == expect
+            assert buffered.getMaxLength(left, right) == expect
+
+
+@pytest.mark.parametrize('method', [
+    FindString.naive_find, FindString.binary_find, FindString.margin_find])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_with_run_length_oracle(method, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        oracle = RunLengthOracle(target, query)
+        finder = FindString(target, query, oracle=oracle)
+        assert method(finder) == (start, start + qlen - 1)
+
+
+def test_find_in_huge_target_described_by_runs():
+    tlen, qlen = 2**30, 2**13
+    # shorter decoy runs either side of the needle
+    start = random.randint(2**20, tlen - 2**20)
+    runs = [(100, 100 + qlen - 2), (start, start + qlen - 1),
+            (tlen - qlen, tlen - 2)]
+    oracle = RunLengthOracle.from_runs(tlen, qlen, runs)
+    # the target is not examined when an oracle is supplied
+    finder = FindString(range(tlen), ['x'] * qlen, oracle=oracle)
+    assert finder.binary_find() == (start, start + qlen - 1)
+    assert finder.margin_find() == (start, start + qlen - 1)
+
+
+# file and chunked targets
+
+@pytest.mark.parametrize('method', [
+    FindString.naive_find, FindString.binary_find, FindString.margin_find,
+    FindString.start_find])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_in_file(tmp_path, method, tlen, qlen):
+    path = tmp_path / "target"
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        path.write_bytes(to_bytes(target))
+        finder = FindString.from_file(path, query, trace=True)
+        assert isinstance(finder.target, mmap.mmap)
+        assert method(finder) == (start, start + qlen - 1)
+        finder.target.close()
+
+
+def chunks(tlen, qlen, start, size):
+    """Generate a target of length tlen, with a query of length qlen at start,
+    in chunks of size bytes.
+    """
+    for offset in range(0, tlen, size):
+        chunk = bytearray(b'-' * min(size, tlen - offset))
+        left, right = max(start, offset), min(start + qlen, offset + size)
+        if left < right:
+            chunk[left - offset:right - offset] = b'x' * (right - left)
+        yield chunk
+
+
+@pytest.mark.parametrize('spool', [False, True])
+def test_find_in_chunked_target(tmp_path, spool):
+    tlen, qlen, start = 2**24, 2**13, 2**23 - 100
+    path = tmp_path / "target" if spool else None
+    with map_chunks(chunks(tlen, qlen, start, 2**20), path) as target:
+        assert len(target) == tlen
+        finder = FindString(target, b'x' * qlen)
+        assert finder.binary_find() == (start, start + qlen - 1)
+        assert finder.start_find() == (start, start + qlen - 1)
+        oracle = RunLengthOracle(target, b'x' * qlen)
+        finder = FindString(target, b'x' * qlen, oracle=oracle)
+        assert finder.margin_find() == (start, start + qlen - 1)
+    if spool:
+        with map_file(path) as target:
+            finder = FindString(target, b'x' * qlen)
+            assert finder.binary_find() == (start, start + qlen - 1)
+
+
+# virtual targets
+
+def test_virtual_target_reads_as_its_runs():
+    rand = random.Random(17)
+    for _ in range(50):
+        tlen = rand.randint(1, 40)
+        target = [rand.choice('x--') for _ in range(tlen)]
+        runs, start = [], None
+        for i, char in enumerate(target + ['-']):
+            if char == 'x' and start is None:
+                start = i
+            elif char != 'x' and start is not None:
+                runs.append((start, i - 1))
+                start = None
+        virtual = VirtualTarget(tlen, runs)
+        assert len(virtual) == tlen
+        assert "".join(virtual) == "".join(target)
+        assert virtual[-1] == target[-1]
+        for left, right in all_intervals(tlen):
+            assert virtual[left:right + 1] == "".join(target[left:right + 1])
+        assert virtual[::3] == "".join(target[::3])
+        with pytest.raises(IndexError):
+            virtual[tlen]
+
+
+@pytest.mark.parametrize('kind', ["list", "bytearray", "virtual"])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_build_targets_of_each_kind(kind, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        expect = build_strings(tlen, qlen, start)
+        target, query = build_targets(tlen, qlen, start, kind=kind)
+        assert len(target) == tlen and len(query) == qlen
+        if kind == "bytearray":
+            assert bytes(target) == to_bytes(expect[0])
+        else:
+            assert to_bytes(target[0:tlen]) == to_bytes(expect[0])
+        oracle = target.oracle(qlen) if kind == "virtual" else None
+        finder = FindString(target, query, trace=True, oracle=oracle)
+        assert finder.binary_find() == (start, start + qlen - 1)
+
+
+def test_find_in_virtual_target_of_4_gigabytes():
+    tlen, qlen, start = 2**32, 2**13, 3 * 2**30 + 12345
+    target, query = build_targets(tlen, qlen, start, kind="virtual")
+    finder = FindString(target, query, oracle=target.oracle(qlen))
+    for method in (finder.binary_find, finder.margin_find, finder.start_find):
+        assert method() == (start, start + qlen - 1)
+    assert finder.find_all() == [(start, start + qlen - 1)]
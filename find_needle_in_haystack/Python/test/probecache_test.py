@@ -0,0 +1,80 @@
+import pytest
+
+from findstring import FindString
+from probecache import ProbeCache
+
+from test.findstring_test import build_strings, EVEN_TESTS, ODD_TESTS
+
+"""
+Tests the ProbeCache memo of probe results, alone and in front of
+FindString._contains.
+
+Examples:
+
+  pytest -v test/probecache_test.py
+"""
+
+
+def test_cache_returns_exact_repeats():
+    cache = ProbeCache()
+    assert cache.lookup(2, 5) is None
+    cache.store(2, 5, True)
+    cache.store(6, 9, False)
+    assert cache.lookup(2, 5) is True
+    assert cache.lookup(6, 9) is False
+    assert (cache.hits, cache.inferred, cache.misses) == (2, 0, 1)
+
+
+def test_cache_infers_from_monotonicity():
+    cache = ProbeCache()
+    cache.store(2, 5, True)
+    cache.store(10, 20, False)
+    assert cache.lookup(0, 5) is True     # encloses a positive
+    assert cache.lookup(2, 8) is True
+    assert cache.lookup(12, 15) is False  # inside a negative
+    assert cache.lookup(10, 19) is False
+    assert cache.lookup(3, 5) is None     # inside a positive
+    assert cache.lookup(9, 20) is None    # encloses a negative
+    assert (cache.hits, cache.inferred, cache.misses) == (0, 4, 2)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ProbeCache(2)
+    cache.store(0, 1, False)
+    cache.store(2, 3, False)
+    cache.lookup(0, 1)
+    cache.store(4, 5, False)
+    assert list(cache.results) == [(0, 1), (4, 5)]
+
+
+def test_cache_size_less_than_1_raises():
+    with pytest.raises(ValueError):
+        ProbeCache(0)
+
+
+@pytest.mark.parametrize('method', [
+    FindString.naive_find, FindString.binary_find, FindString.margin_find])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_find_with_cache(method, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = FindString(target, query, metrics=True, cache=4)
+        assert method(finder) == (start, start + qlen - 1)
+        assert method(finder) == (start, start + qlen - 1)
+
+
+def test_cache_saves_calls_between_searches():
+    tlen, qlen, start = 2**16, 2**9, 12345
+    target, query = build_strings(tlen, qlen, start)
+    uncached = FindString(target, query, metrics=True)
+    cached = FindString(target, query, metrics=True, cache=True)
+
+    for finder in (uncached, cached):
+        assert finder.binary_find() == (start, start + qlen - 1)
+        assert finder.margin_find() == (start, start + qlen - 1)
+
+    assert cached.metrics.calls < uncached.metrics.calls
+    assert cached.metrics.hits > 0
+    assert cached.metrics.hits + cached.metrics.misses == \
+        uncached.metrics.calls
+    assert cached.metrics.misses == cached.metrics.calls
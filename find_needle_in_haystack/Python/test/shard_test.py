@@ -0,0 +1,101 @@
+import pytest
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from findstring import FindString
+from shard import ShardedFindString, partitions
+
+from test.findstring_test import all_runs, build_strings, EVEN_TESTS, \
+    ODD_TESTS
+
+"""
+Tests ShardedFindString on a process pool, with queries placed at and across
+the boundaries of shards.
+
+Examples:
+
+  pytest -v test/shard_test.py
+"""
+
+METHODS = ["naive_find", "binary_find", "margin_find", "start_find"]
+
+
+@pytest.fixture(scope="module")
+def processes():
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 100])
+@pytest.mark.parametrize(['tlen', 'qlen'], [(8, 1), (8, 4), (7, 7), (100, 9)])
+def test_partitions_cover_each_start_once(tlen, qlen, count):
+    shards = partitions(tlen, qlen, count)
+    assert 1 <= len(shards) <= count
+    starts = [start for left, right in shards
+              for start in range(left, right - qlen + 2)]
+    assert starts == list(range(tlen - qlen + 1))
+    for (_, right), (left, _) in zip(shards, shards[1:]):
+        assert right - left + 1 == qlen - 1  # overlap
+
+
+@pytest.mark.parametrize('shards', [1, 2, 3])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_sharded_find(processes, shards, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        with ShardedFindString(target, query, shards, processes) as finder:
+            for method in METHODS:
+                assert getattr(finder, method)() == (start, start + qlen - 1)
+            assert finder.find_all() == [(start, start + qlen - 1)]
+
+
+def test_sharded_find_without_match(processes):
+    with ShardedFindString(b'-' * 64, b'x' * 4, 4, processes) as finder:
+        for method in METHODS:
+            assert getattr(finder, method)() == FindString.NO_MATCH
+        assert finder.find_all() == []
+
+
+def test_sharded_find_all_joins_runs_across_shards(processes):
+    rand = random.Random(16)
+    for _ in range(20):
+        tlen = rand.randint(20, 200)
+        target = [rand.choice('xxx--') for _ in range(tlen)]
+        query = ['x'] * rand.randint(1, 5)
+        with ShardedFindString(target, query, rand.randint(1, 9),
+                               processes) as finder:
+            assert finder.find_all() == all_runs(target, query)
+
+
+def test_sharded_find_in_file(tmp_path, processes):
+    tlen, qlen, start = 2**20, 2**10, 2**19 - 100
+    target, query = build_strings(tlen, qlen, start)
+    path = tmp_path / "target"
+    path.write_bytes("".join(target).encode("latin-1"))
+    with ShardedFindString.from_file(path, query, 4, processes) as finder:
+        assert finder.binary_find() == (start, start + qlen - 1)
+        assert finder.naive_find() == (start, start + qlen - 1)
+
+
+def test_own_process_pool():
+    target, query = build_strings(2**12, 2**4, 2**11 - 3)
+    with ShardedFindString(target, query, 2) as finder:
+        assert finder.binary_find() == (2**11 - 3, 2**11 + 12)
+
+
+def test_close_frees_shared_memory():
+    finder = ShardedFindString(b'--xx--', b'xx', 2)
+    name = finder.shared.name
+    finder.close()
+    finder.close()
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=name)
+
+
+def test_bad_lengths():
+    with pytest.raises(ValueError):
+        ShardedFindString(b'xx', b'xxx')
+    with pytest.raises(ValueError):
+        ShardedFindString(b'xx', b'x', 0)
@@ -0,0 +1,144 @@
+import pytest
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from findstring import FindString
+from oracle import BufferOracle, RunLengthOracle, map_file
+from speculative import SpeculativeFindString
+
+from test.findstring_test import build_strings, EVEN_TESTS, ODD_TESTS
+
+"""
+Tests SpeculativeFindString on thread and process pools, and that it cuts
+the elapsed time of searches using a slow oracle.
+
+Examples:
+
+  pytest -v test/speculative_test.py
+"""
+
+
+class SlowOracle(BufferOracle):
+    """A BufferOracle taking latency seconds to answer each call."""
+
+    latency = 0.0
+
+    def __init__(self, target, query, latency):
+        super().__init__(target, query)
+        self.latency = latency
+
+    def getMaxLength(self, startPosition, endPosition):
+        time.sleep(self.latency)
+        return super().getMaxLength(startPosition, endPosition)
+
+
+@pytest.fixture(scope="module")
+def threads():
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize('method', [
+    SpeculativeFindString.binary_find, SpeculativeFindString.margin_find])
+@pytest.mark.parametrize('depth', [0, 1, 2])
+@pytest.mark.parametrize(['tlen', 'qlen'], EVEN_TESTS + ODD_TESTS)
+def test_speculative_find(threads, method, depth, tlen, qlen):
+    for start in range(tlen - qlen + 1):
+        target, query = build_strings(tlen, qlen, start)
+        finder = SpeculativeFindString(target, query, threads, depth,
+                                       trace=True, metrics=True)
+        assert method(finder) == (start, start + qlen - 1)
+        assert finder.pending == {}
+
+
+@pytest.mark.parametrize('method', [
+    SpeculativeFindString.binary_find, SpeculativeFindString.margin_find])
+def test_speculative_find_without_match(threads, method):
+    finder = SpeculativeFindString(['-'] * 64, ['x'] * 4, threads)
+    assert method(finder) == FindString.NO_MATCH
+
+
+@pytest.mark.parametrize('method', [
+    SpeculativeFindString.naive_find, SpeculativeFindString.start_find,
+    SpeculativeFindString.cost_find])
+def test_other_searches_leave_nothing_pending(threads, method):
+    tlen, qlen, start = 2**12, 2**3, 1000
+    target, query = build_strings(tlen, qlen, start)
+    finder = SpeculativeFindString(target, query, threads)
+    assert method(finder) == (start, start + qlen - 1)
+    assert finder.pending == {}
+    assert finder.find_all() == [(start, start + qlen - 1)]
+    assert finder.pending == {}
+
+
+def test_failed_search_leaves_nothing_pending(threads):
+    class FailingOracle(BufferOracle):
+        def getMaxLength(self, startPosition, endPosition):
+            raise RuntimeError("oracle failed")
+
+    target, query = build_strings(2**8, 2**2, 100)
+    finder = SpeculativeFindString(target, query, threads, 2,
+                                   oracle=FailingOracle(target, query))
+    with pytest.raises(RuntimeError):
+        finder.binary_find()
+    assert finder.pending == {}
+
+
+def test_speculative_find_in_processes():
+    tlen, qlen = 2**12, 2**5
+    for start in (0, 1000, tlen - qlen):
+        target, query = build_strings(tlen, qlen, start)
+        with SpeculativeFindString(target, query, 2) as finder:
+            assert finder.binary_find() == (start, start + qlen - 1)
+            assert finder.margin_find() == (start, start + qlen - 1)
+        assert finder.processes is None and finder.shared is None
+
+
+def test_speculative_find_in_processes_with_other_oracle():
+    target, query = build_strings(2**10, 2**4, 500)
+    oracle = RunLengthOracle(target, query)
+    with SpeculativeFindString(target, query, 2, oracle=oracle) as finder:
+        assert finder.shared is None
+        assert finder.binary_find() == (500, 500 + 2**4 - 1)
+
+
+def test_speculative_find_in_mapped_file(tmp_path):
+    tlen, qlen, start = 2**16, 2**6, 40000
+    target, query = build_strings(tlen, qlen, start)
+    path = tmp_path / "target"
+    path.write_bytes("".join(target).encode("latin-1"))
+    mapped = map_file(path)
+    try:
+        with SpeculativeFindString(mapped, query, 2) as finder:
+            assert finder.binary_find() == (start, start + qlen - 1)
+    finally:
+        mapped.close()
+
+
+def test_process_pool_raises():
+    target, query = build_strings(64, 4, 10)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            SpeculativeFindString(target, query, executor)
+    with pytest.raises(ValueError):
+        SpeculativeFindString(target, query, 0)
+
+
+def test_speculation_cuts_elapsed_time(threads):
+    tlen, qlen, start, latency = 2**12, 2**4, 1234, 0.01
+    target, query = build_strings(tlen, qlen, start)
+
+    sequential = FindString(target, query, metrics=True,
+                            oracle=SlowOracle(target, query, latency))
+    begin = time.perf_counter()
+    assert sequential.binary_find() == (start, start + qlen - 1)
+    elapsed = time.perf_counter() - begin
+
+    speculative = SpeculativeFindString(
+        target, query, threads, 2, metrics=True,
+        oracle=SlowOracle(target, query, latency))
+    begin = time.perf_counter()
+    assert speculative.binary_find() == (start, start + qlen - 1)
+    assert time.perf_counter() - begin < elapsed / 2
+    assert speculative.metrics.calls > sequential.metrics.calls
@@ -0,0 +1,89 @@
+import io
+import json
+import pytest
+
+from findstring import FindString
+from trace import trace
+
+from test.findstring_test import build_strings
+
+"""
+Tests the trace event sink and its renderers.
+
+Examples:
+
+  pytest -v test/trace_test.py
+"""
+
+
+def traced_finder(tlen, qlen, start, size=True):
+    target, query = build_strings(tlen, qlen, start)
+    if tlen > trace.MAX_TRACE_WIDTH:
+        target = "".join(target).encode("latin-1")
+    return FindString(target, query, trace=size)
+
+
+def test_live_print_matches_renderer(capsys):
+    finder = traced_finder(8, 4, 2)
+    assert finder.margin_find() == (2, 5)
+    live = capsys.readouterr().out
+    assert live.splitlines()[0] == "mf in  [--xxxx--]  8/4 (0, 7) margin 4"
+    finder.trace.print()
+    assert capsys.readouterr().out == live
+
+
+def test_large_target_records_without_printing(capsys):
+    tlen, qlen, start = 2**20, 2**13, 123457
+    finder = traced_finder(tlen, qlen, start)
+    assert finder.binary_find() == (start, start + qlen - 1)
+    assert capsys.readouterr().out == ""
+    events = list(finder.trace.events)
+    assert events[0][:4] == ("bf in", 0, tlen - 1, None)
+    assert events[-1][:3] == ("mf >>", start, start + qlen - 1)
+    times = [event[4] for event in events]
+    assert times == sorted(times)
+    finder.trace.print()
+    assert capsys.readouterr().out.splitlines()[0] == \
+        "bf in  1048576/8192 (0, 1048575)"
+
+
+def test_ring_buffer_keeps_latest_events():
+    finder = traced_finder(2**12, 2**3, 1001, size=4)
+    finder.start_find()
+    events = list(finder.trace.events)
+    assert len(events) == 4
+    assert events[-1][0] == "sf >>"
+    assert finder.trace.dropped > 0
+    finder.trace.clear()
+    assert len(finder.trace.events) == 0 and finder.trace.dropped == 0
+
+
+def test_trace_size_less_than_one():
+    finder = traced_finder(8, 4, 2, size=False)
+    with pytest.raises(ValueError):
+        trace(finder, 0)
+
+
+def test_dump_jsonl():
+    finder = traced_finder(2**10, 2**4, 100)
+    finder.margin_find()
+    out = io.StringIO()
+    finder.trace.dump_jsonl(out)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(lines) == len(finder.trace.events)
+    assert lines[0] == {"op": "mf in", "left": 0, "right": 2**10 - 1,
+                        "margin": 2**9, "t_ns": finder.trace.events[0][4]}
+
+
+def test_dump_chrome():
+    finder = traced_finder(2**10, 2**4, 100)
+    finder.binary_find()
+    out = io.StringIO()
+    finder.trace.dump_chrome(out)
+    report = json.loads(out.getvalue())
+    events = report["traceEvents"]
+    assert len(events) == 2 * len(finder.trace.events)
+    assert [event["name"] for event in events if event["ph"] == "i"] == \
+        [event[0] for event in finder.trace.events]
+    assert events[1]["args"] == {"slen": 2**10}
+    assert report["otherData"] == {"tlen": 2**10, "qlen": 2**4, "dropped": 0}
@@ -1,4 +1,34 @@
+import mmap
 import pytest
+import random
+import re
+import sys
+import time
+
+from itertools import permutations
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, for solve_many on arrays
+    np = None
+
+# digits per number in the vectorised solve_many: numbers below 10**WIDTH,
+# whose solutions are also below 10**WIDTH, fit in an int64
+WIDTH = 18
+
+# numbers solved at a time by the vectorised solve_many, bounding the memory
+# used for digit arrays
+CHUNK_SIZE = 2**16
+
+# bytes copied at a time when reversing a buffer in place, and the first
+# window searched for the start of a run of digits
+BLOCK_SIZE = 2**16
+
+# any byte other than an ASCII digit
+NON_DIGIT = re.compile(rb"[^0-9]")
+
+# ASCII digits, as bytes for find() on any buffer
+DIGITS = [bytes([48 + digit]) for digit in range(10)]
 
 
 def solve(n):
@@ -18,14 +48,284 @@ def solve(n):
     return _merge_digits(digits)
 
 
+def solve_digits(digits):
+    """Solve for a number given as a string of decimal digits, a str, bytes
+    or bytearray, returning the answer as the same type, or -1 if there is
+    no solution. Avoids the int/str conversions of solve(), which are
+    quadratic in the number of digits (and limited to 4300 digits by
+    default), so suits numbers of any length.
+    """
+    if isinstance(digits, str):
+        buffer = bytearray(digits.encode("ascii"))
+    else:
+        buffer = bytearray(digits)
+    if not buffer.isdigit():
+        raise ValueError("digits must be decimal digits")
+
+    if not _next_permutation(buffer):
+        return -1
+
+    if isinstance(digits, str):
+        return buffer.decode("ascii")
+    return type(digits)(buffer)
+
+
+def next_permutation(buffer):
+    """Rearrange a mutable buffer of ASCII digits, such as a bytearray or a
+    writable mmap, into the next larger number in place, returning True, or
+    leave it unchanged and return False if there is none. Uses O(1) memory
+    beyond the buffer, so suits digits of any length, and a file of digits
+    can be rearranged through solve_file() without reading it into memory.
+    """
+    if NON_DIGIT.search(buffer):
+        raise ValueError("digits must be decimal digits")
+    return _next_permutation(buffer)
+
+
+def solve_file(path):
+    """Rearrange the digits in the file at path into the next larger number
+    in place, through a memory map, returning True, or False if there is
+    none. The file must hold only ASCII digits.
+    """
+    with open(path, "r+b") as source:
+        if not source.seek(0, 2):
+            return False  # an empty file cannot be mapped
+        with mmap.mmap(source.fileno(), 0) as buffer:
+            found = next_permutation(buffer)
+            buffer.flush()
+            return found
+
+
+def solve_many(numbers):
+    """Solve for many numbers. Given a NumPy integer array of numbers below
+    10**WIDTH, solves them all with array operations on their digits and
+    returns an int64 array of the answers (-1 for no solution). Given any
+    other iterable of ints, of any size, returns a generator of solve() of
+    each.
+    """
+    if np is not None and isinstance(numbers, np.ndarray):
+        return _solve_array(numbers)
+    return (solve(n) for n in numbers)
+
+
+def _solve_array(numbers):
+    """Solve an array of numbers in chunks of CHUNK_SIZE."""
+    if numbers.dtype.kind not in "iu":
+        raise ValueError("numbers must be integers")
+    numbers = numbers.ravel()
+    if len(numbers) and numbers.min() < 0:
+        raise ValueError("number must be at least 0")
+    if len(numbers) and numbers.max() >= 10**WIDTH:
+        raise ValueError("number must be less than 10**%d" % WIDTH)
+
+    numbers = numbers.astype(np.int64)
+    solutions = np.empty(len(numbers), dtype=np.int64)
+    for start in range(0, len(numbers), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        solutions[start:stop] = _solve_chunk(numbers[start:stop])
+    return solutions
+
+
+def _solve_chunk(numbers):
+    """Solve an int64 array of numbers below 10**WIDTH, following the steps
+    of solve() on a matrix of their digits, one row per number with the most
+    significant digit first, padded on the left with zeros.
+    """
+    powers = 10 ** np.arange(WIDTH - 1, -1, -1, dtype=np.int64)
+    columns = np.arange(WIDTH)
+    rows = np.arange(len(numbers))
+
+    # split digits off the right, dividing by a scalar, column by column
+    digits = np.empty((WIDTH, len(numbers)), dtype=np.int8)
+    rest = numbers
+    for column in range(WIDTH - 1, -1, -1):
+        quotient = rest // 10
+        digits[column] = rest - quotient * 10
+        rest = quotient
+    digits = np.ascontiguousarray(digits.T)
+
+    # leading zeros are padding, not digits of the number
+    padding = numbers[:, None] < powers
+
+    # rightmost transition, if any
+    rising = (digits[:, :-1] < digits[:, 1:]) & ~padding[:, :-1]
+    found = rising.any(axis=1)
+    transition = WIDTH - 2 - np.argmax(rising[:, ::-1], axis=1)
+    pivot = digits[rows, transition]
+
+    # rightmost, so least, digit in the descending tail above pivot
+    tail = columns > transition[:, None]
+    above = tail & (digits > pivot[:, None])
+    swap = WIDTH - 1 - np.argmax(above[:, ::-1], axis=1)
+
+    # exchange
+    digits[rows, transition] = digits[rows, swap]
+    digits[rows, swap] = pivot
+
+    # merge, reversing tail by weighting its digits in ascending powers of
+    # 10, then dividing out the powers below it
+    head = (digits * ~tail) @ powers
+    reversed_tail = (digits * tail) @ powers[::-1] // \
+        powers[WIDTH - 2 - transition]
+    return np.where(found, head + reversed_tail, -1)
+
+
+def solve_kth(n, k):
+    """Return the k-th next larger number with the same digits as n (k = 1
+    is solve(n)), or -1 if there are fewer than k, without stepping through
+    the ones between. Only the shortest suffix of the digits with k
+    arrangements above it changes: it is found by ranking suffixes from the
+    right (see rank()) and replaced by the arrangement k places above, so
+    the cost depends on the length of that suffix, about log10(k) digits
+    plus repeats, rather than on k.
+    """
+    if n < 0:
+        raise ValueError("number must be at least 0")
+    if k < 0:
+        raise ValueError("k must be at least 0")
+
+    digits = _split_digits(n)
+
+    if k == 0:
+        return n
+    if k == 1:
+        i = _find_transition(digits)
+        return i if i == -1 else _merge_digits(_reorder(digits, i))
+
+    counts = [0] * 10
+    for i, place, total, position in _suffix_ranks(digits, counts):
+        if total - position > k:
+            digits[i:] = _unrank(counts, place, total, position + k)
+            return _merge_digits(digits)
+    return -1
+
+
+def rank(n):
+    """Return the lexicographic rank, from 0, of n among all the
+    arrangements of its digits (including any with leading zeros), counting
+    repeated digits once, so that solve_kth(n, k) has rank rank(n) + k.
+    """
+    if n < 0:
+        raise ValueError("number must be at least 0")
+
+    position = 0
+    for _, _, _, position in _suffix_ranks(_split_digits(n), [0] * 10):
+        pass
+    return position
+
+
+def _suffix_ranks(digits, counts):
+    """Generate (i, size, total, position) for each suffix digits[i:], from
+    the shortest, where total is the number of distinct arrangements of its
+    size digits and position is the rank of the suffix among them. counts
+    is updated with the count of each digit in the suffix.
+    """
+    total, position = 1, 0
+    for i in range(len(digits) - 1, -1, -1):
+        digit = digits[i] - 48  # ASCII '0'
+        size = len(digits) - i
+
+        # arrangements starting with a smaller digit come first
+        below = sum(counts[:digit])
+        counts[digit] += 1
+        total = total * size // counts[digit]
+        position += total * below // size
+
+        yield i, size, total, position
+
+
+def _unrank(counts, size, total, position):
+    """Return the arrangement of rank position among the total arrangements
+    of size digits with counts of each digit, as a bytearray.
+    """
+    out = bytearray()
+    for _ in range(size):
+        for digit in range(10):
+            if counts[digit]:
+                block = total * counts[digit] // size
+                if position < block:
+                    break
+                position -= block
+        out.append(48 + digit)
+        total = block
+        counts[digit] -= 1
+        size -= 1
+    return out
+
+
 def _split_digits(n):
-    """Split an unsigned integer into digits and return the list."""
-    return list(str(n))
+    """Split an unsigned integer into digits and return them as a bytearray
+    of ASCII digits.
+    """
+    return bytearray(str(n), "ascii")
 
 
 def _merge_digits(digits):
-    """Merge a list of digits and return the unsigned integer value."""
-    return int("".join(digits))
+    """Merge a bytearray of ASCII digits and return the unsigned integer
+    value.
+    """
+    return int(digits)
+
+
+def _next_permutation(buffer):
+    """Carry out the steps of solve() in place on a buffer of ASCII digits,
+    returning False if there is no transition.
+    """
+    i = _find_transition_by_runs(buffer)
+
+    if i == -1:
+        return False
+
+    _reorder(buffer, i)
+
+    return True
+
+
+def _find_transition_by_runs(buffer):
+    """Find the transition in a buffer of ASCII digits as _find_transition()
+    does, but a run of equal digits at a time, searching for the byte before
+    each run with find(). The tail right of the transition is descending, so
+    has at most ten runs.
+    """
+    i = len(buffer) - 1
+    while i > 0:
+        digit = buffer[i]
+        j = _find_other(buffer, i, digit)
+        if j == -1 or buffer[j] < digit:
+            return j
+        i = j
+    return -1
+
+
+def _find_other(buffer, end, digit):
+    """Return the rightmost index before end of a digit other than digit in
+    a buffer of ASCII digits, or -1. Searches windows doubling in size from
+    BLOCK_SIZE leftwards, so that the cost follows the length of the run of
+    digit rather than of the buffer.
+    """
+    others = [other for other in DIGITS if other[0] != digit]
+    width = BLOCK_SIZE
+    while end > 0:
+        start = max(end - width, 0)
+        found = max(buffer.rfind(other, start, end) for other in others)
+        if found != -1:
+            return found
+        end = start
+        width *= 2
+    return -1
+
+
+def _reverse(buffer, start, end):
+    """Reverse buffer[start:end] in place, exchanging a block of BLOCK_SIZE
+    bytes from each end at a time.
+    """
+    while end - start >= 2 * BLOCK_SIZE:
+        left = buffer[start:start + BLOCK_SIZE]
+        buffer[start:start + BLOCK_SIZE] = buffer[end - BLOCK_SIZE:end][::-1]
+        buffer[end - BLOCK_SIZE:end] = left[::-1]
+        start += BLOCK_SIZE
+        end -= BLOCK_SIZE
+    buffer[start:end] = buffer[start:end][::-1]
 
 
 def _find_transition(digits):
@@ -43,9 +343,11 @@ def _find_transition(digits):
 
 
 def _reorder(digits, transition):
-    """Given a list of digits and a transition index, find the next highest digit
-     afer the transition and swap these two, then sort the tail of the
-     list ascending.
+    """Given a bytearray of digits and a transition index, find the next
+    highest digit after the transition and swap these two, then reverse the
+    tail of the digits in place, a block at a time. The tail is descending,
+    being right of the rightmost transition, and remains so after the swap,
+    so reversing sorts it ascending.
     """
 
     end = len(digits)
@@ -57,29 +359,55 @@ def _reorder(digits, transition):
     # exchange
     digits[transition], digits[swap] = digits[swap], pivot
 
-    # sort tail
-    digits = digits[:transition+1] + sorted(digits[transition+1:])
+    # reverse tail
+    _reverse(digits, transition+1, end)
 
     return digits
 
 
 def _find_least_above(digits, start, end, threshold):
-    """Given a list of digits and range [start, end), find the least element
-    larger than threshold, and return its index, or -1 if no such element
-    exists.
+    """Given a list of digits, descending in the range [start, end), find
+    the least element larger than threshold by binary search, and return
+    its index (the rightmost, if repeated), or -1 if no such element exists.
     """
 
-    j = start
-    winner = digits[start]
+    # the elements above threshold are a prefix of the range
+    low, high = start, end
+    while low < high:
+        middle = (low + high) // 2
+        if digits[middle] > threshold:
+            low = middle + 1
+        else:
+            high = middle
 
-    for i in range(start+1, end):
-        digit = digits[i]
-        if digit < winner and digit > threshold:
-            winner, j = digit, i
+    return low - 1 if low > start else -1
 
-    if winner > threshold:
-        return j
-    return -1
+
+def benchmark(count=10**6, seed=0):
+    """Print the throughput of solve_many over an array of count random
+    numbers below 10**WIDTH, and of a loop calling solve() on each.
+    """
+    rand = random.Random(seed)
+    numbers = [rand.randrange(10**WIDTH) for _ in range(count)]
+
+    begin = time.perf_counter()
+    expect = [solve(n) for n in numbers]
+    looped = time.perf_counter() - begin
+
+    if np is None:
+        print("solve loop", count, "numbers", "%6.4f" % looped, "seconds")
+        print("numpy is not installed, solve_many uses the loop")
+        return
+
+    array = np.array(numbers, dtype=np.int64)
+    begin = time.perf_counter()
+    solutions = solve_many(array)
+    vectorised = time.perf_counter() - begin
+    assert solutions.tolist() == expect
+
+    for name, elapsed in (("solve loop", looped), ("solve_many", vectorised)):
+        print("%-10s %d numbers %6.4f seconds, %d numbers/second" %
+              (name, count, elapsed, count / elapsed))
 
 
 # tests ############################################################
@@ -125,3 +453,184 @@ def test_solve_example_1234321():
 
 def test_solve_example_123987():
     assert solve(123987) == 127389
+
+
+# solve_digits
+
+def brute_force(n):
+    """Return the next larger permutation of the digits of n by trying them
+    all, or -1."""
+    above = [int("".join(p)) for p in permutations(str(n))
+             if int("".join(p)) > n]
+    return min(above) if above else -1
+
+
+def test_solve_agrees_with_brute_force():
+    for n in list(range(1000)) + [12344321, 1022, 9876501, 505, 2000]:
+        assert solve(n) == brute_force(n)
+
+
+def test_solve_digits_returns_same_type():
+    assert solve_digits("1234321") == "1241233"
+    assert solve_digits(b"1234321") == b"1241233"
+    assert solve_digits(bytearray(b"1234321")) == bytearray(b"1241233")
+    assert solve_digits("4321") == -1
+
+
+def test_solve_digits_does_not_change_input():
+    digits = bytearray(b"123987")
+    assert solve_digits(digits) == bytearray(b"127389")
+    assert digits == bytearray(b"123987")
+
+
+def test_solve_digits_raises_with_non_digits():
+    for digits in ["", "12a", "-12", "1\u00b2", b"1 2"]:
+        with pytest.raises(ValueError):
+            solve_digits(digits)
+
+
+def test_solve_digits_with_100k_digits():
+    rand = random.Random(18)
+    head = "".join(rand.choice("0123456789") for _ in range(10**5))
+    digits = "1" + head + "3" + "9" * 10**5 + "2" * 10
+    expect = "1" + head + "9" + "2" * 10 + "3" + "9" * (10**5 - 1)
+    assert solve_digits(digits) == expect
+    assert solve_digits(digits.encode("ascii")) == expect.encode("ascii")
+    assert solve_digits("9" * 10**6) == -1
+
+
+# solve_many
+
+needs_numpy = pytest.mark.skipif(np is None, reason="numpy is not installed")
+
+
+def test_solve_many_streams_any_iterable():
+    numbers = iter([11123, 4321, 10**30 + 1])
+    solutions = solve_many(numbers)
+    assert next(solutions) == 11132
+    assert list(solutions) == [-1, 10**30 + 10]
+
+
+@needs_numpy
+def test_solve_many_agrees_with_solve():
+    rand = random.Random(19)
+    numbers = list(range(2000)) + [10**WIDTH - 1, 10**(WIDTH - 1),
+                                   123456789012345678, 10**17 + 2]
+    numbers += [rand.randrange(10**rand.randint(1, WIDTH))
+                for _ in range(20000)]
+    for dtype in (np.int64, np.uint64):
+        solutions = solve_many(np.array(numbers, dtype=dtype))
+        assert solutions.dtype == np.int64
+        assert solutions.tolist() == [solve(n) for n in numbers]
+
+
+@needs_numpy
+def test_solve_many_in_chunks():
+    numbers = np.arange(10**6, 10**6 + 2 * CHUNK_SIZE + 5)
+    assert solve_many(numbers).tolist() == [solve(int(n)) for n in numbers]
+    assert solve_many(np.array([], dtype=np.int64)).tolist() == []
+
+
+@needs_numpy
+def test_solve_many_raises_with_bad_numbers():
+    for numbers in ([-1, 2], [10**WIDTH], [1.5]):
+        with pytest.raises(ValueError):
+            solve_many(np.array(numbers))
+
+
+# solve_kth and rank
+
+def arrangements(n):
+    """Return the distinct arrangements of the digits of n in order."""
+    return sorted(set("".join(p) for p in permutations(str(n))))
+
+
+def test_rank_agrees_with_brute_force():
+    for n in list(range(200)) + [1022, 3102, 112233, 987654, 1000, 4321]:
+        assert rank(n) == arrangements(n).index(str(n))
+
+
+def test_solve_kth_agrees_with_brute_force():
+    for n in [0, 7, 12, 21, 1022, 1234, 3102, 11123, 112233, 9876540]:
+        ordered = arrangements(n)
+        here = ordered.index(str(n))
+        for k in range(len(ordered) - here + 2):
+            expect = int(ordered[here + k]) if here + k < len(ordered) else -1
+            assert solve_kth(n, k) == expect
+
+
+def test_solve_kth_matches_repeated_solve():
+    n, k = 1234567890123, 2000
+    m = n
+    for _ in range(k):
+        m = solve(m)
+    assert solve_kth(n, k) == m
+
+
+def test_solve_kth_with_huge_jump():
+    n = int("1" * 20 + "2" * 20 + "3" * 20)
+    k = 10**25
+    assert rank(solve_kth(n, k)) == rank(n) + k
+    assert solve_kth(int("3" * 20 + "2" * 20 + "1" * 20), 1) == -1
+
+
+def test_solve_kth_raises_with_negative_input():
+    with pytest.raises(ValueError):
+        solve_kth(-1, 1)
+    with pytest.raises(ValueError):
+        solve_kth(1, -1)
+    with pytest.raises(ValueError):
+        rank(-1)
+
+
+# next_permutation and solve_file
+
+def test_next_permutation_agrees_with_solve():
+    for n in list(range(1000)) + [12344321, 1022, 9876501, 505, 2000]:
+        buffer = bytearray(str(n), "ascii")
+        found = next_permutation(buffer)
+        assert found == (solve(n) != -1)
+        assert int(buffer) == (solve(n) if found else n)
+
+
+def test_next_permutation_over_blocks():
+    rand = random.Random(21)
+    for size in [BLOCK_SIZE - 1, 2 * BLOCK_SIZE, 5 * BLOCK_SIZE + 7]:
+        head = "".join(rand.choice("0123456789") for _ in range(100))
+        tail = "".join(sorted(rand.choice("0123456789")
+                              for _ in range(size)))[::-1]
+        digits = head + tail
+        buffer = bytearray(digits, "ascii")
+        assert next_permutation(buffer)
+        assert buffer.decode("ascii") == solve_digits(digits)
+
+
+def test_next_permutation_walks_all_arrangements():
+    buffer = bytearray(b"001223")
+    seen = [bytes(buffer)]
+    while next_permutation(buffer):
+        seen.append(bytes(buffer))
+    assert seen == [s.encode("ascii") for s in arrangements("001223")]
+
+
+def test_next_permutation_raises_with_non_digits():
+    with pytest.raises(ValueError):
+        next_permutation(bytearray(b"12\n"))
+
+
+def test_solve_file(tmp_path):
+    path = tmp_path / "digits"
+    path.write_bytes(b"1" + b"3" + b"9" * 10**6 + b"2")
+    assert solve_file(path)
+    assert path.read_bytes() == b"1" + b"9" + b"2" + b"3" + b"9" * (10**6 - 1)
+
+    path.write_bytes(b"987")
+    assert not solve_file(path)
+    assert path.read_bytes() == b"987"
+
+    path.write_bytes(b"")
+    assert not solve_file(path)
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10**6)
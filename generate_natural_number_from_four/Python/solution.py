@@ -1,4 +1,44 @@
+import mmap
+import os
 import pytest
+import random
+import sys
+import tempfile
+import time
+
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, for step_counts over large ranges
+    np = None
+
+# op codes of the steps of a path, indexing MESSAGES
+OP_START, OP_APPEND0, OP_APPEND4, OP_DIVIDE2 = range(4)
+
+# paths kept by a PathCache by default
+DEFAULT_CACHE_SIZE = 2**16
+
+# numbers visited by solve_optimal before it gives up on a search
+DEFAULT_SEARCH_LIMIT = 2**20
+
+# decimal digits per limb in solve_digits
+LIMB_DIGITS = 18
+LIMB = 10**LIMB_DIGITS
+
+# doublings held back by solve_digits before applying them to every limb
+FOLD_LIMIT = 2**60
+
+# numbers counted at a time by each worker of step_counts
+CHUNK_SIZE = 2**20
+
+# numbers below which step_counts walks each path to 4
+BASE_SIZE = 100
+
+# bytes per count written by step_counts
+COUNT_SIZE = array("I").itemsize
 
 
 def START(n): return message("start", n)
@@ -16,28 +56,23 @@ def DIVIDE2(n): return message("divide2", n)
 def message(state, value): return "%s: %d" % (state, value)
 
 
+# message of each op code
+MESSAGES = (START, APPEND0, APPEND4, DIVIDE2)
+
+
 def solve_iterative(n):
     if n < 1:
         raise ValueError("value must be greater than 0")
 
     path = []
 
-    while True:
-        if n == 4:  # solution found
-            path.insert(0, START(n))
-            break
-
-        prefix, digit = n // 10, n % 10
+    while n != 4:
+        op, previous = _step(n)
+        path.append(MESSAGES[op](n))
+        n = previous
 
-        if digit == 4:
-            path.insert(0, APPEND4(n))
-            n = prefix
-        elif digit == 0:
-            path.insert(0, APPEND0(n))
-            n = prefix
-        else:
-            path.insert(0, DIVIDE2(n))
-            n *= 2
+    path.append(START(n))
+    path.reverse()
 
     return path
 
@@ -71,6 +106,464 @@ def _solve_recursive(n):
     return path
 
 
+def solve_cached(n):
+    """Return the Path to n from the default PathCache."""
+    return _default_cache.solve(n)
+
+
+def solve_range(lo, hi):
+    """Return a generator of the Path to each n in [lo, hi) from the default
+    PathCache.
+    """
+    return _default_cache.solve_range(lo, hi)
+
+
+def solve_optimal(n, limit=DEFAULT_SEARCH_LIMIT):
+    """Return a shortest Path to n, found by a breadth first search forwards
+    from 4 (appending 0 or 4, or halving an even number) and backwards from
+    n (reversing the rules as solve_iterative does) at once, expanding the
+    smaller frontier a level at a time until they meet. If more than limit
+    numbers are visited, gives up and returns the path of solve_cached(n).
+    """
+    if n < 1:
+        raise ValueError("value must be greater than 0")
+    if n == 4:
+        return ROOT
+
+    # number -> neighbour towards 4 or n; each frontier is one level
+    forward, backward = {4: None}, {n: None}
+    forward_frontier, backward_frontier = [4], [n]
+
+    while len(forward) + len(backward) <= limit:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = _expand(
+                forward_frontier, forward, backward, _forward_steps)
+        else:
+            backward_frontier, meeting = _expand(
+                backward_frontier, backward, forward, _backward_steps)
+        if meeting is not None:
+            return _join(forward, backward, meeting)
+
+    return solve_cached(n)
+
+
+def _forward_steps(n):
+    """Generate the numbers one step forwards from n."""
+    yield n * 10
+    yield n * 10 + 4
+    if n % 2 == 0:
+        yield n // 2
+
+
+def _backward_steps(n):
+    """Generate the numbers one step backwards from n."""
+    yield n * 2
+    if n % 10 in (0, 4) and n >= 10:
+        yield n // 10
+
+
+def _expand(frontier, visited, other, steps):
+    """Visit the numbers one step from frontier, returning the next frontier
+    and the number at which it meets the other search with the fewest steps
+    in total, or None. Every number in the next frontier is the same number
+    of steps from its start, so the whole level is searched for the best,
+    measuring the other search's steps by following its links.
+    """
+    following = []
+    meeting, best = None, None
+    for n in frontier:
+        for m in steps(n):
+            if m in visited:
+                continue
+            visited[m] = n
+            following.append(m)
+            if m in other:
+                distance = _distance(other, m)
+                if best is None or distance < best:
+                    meeting, best = m, distance
+    return following, meeting
+
+
+def _distance(links, n):
+    """Return the number of links from n back to the start of a search."""
+    distance = 0
+    while links[n] is not None:
+        n = links[n]
+        distance += 1
+    return distance
+
+
+def _join(forward, backward, meeting):
+    """Return the Path through meeting, following the links of the forward
+    search back to 4 and of the backward search on to n.
+    """
+    values = []
+    n = meeting
+    while n is not None:
+        values.append(n)
+        n = forward[n]
+    values.reverse()
+    n = backward[meeting]
+    while n is not None:
+        values.append(n)
+        n = backward[n]
+
+    path = ROOT
+    for previous, n in zip(values, values[1:]):
+        if n == previous * 10:
+            op = OP_APPEND0
+        elif n == previous * 10 + 4:
+            op = OP_APPEND4
+        else:
+            op = OP_DIVIDE2
+        path = Path(path, op, n)
+    return path
+
+
+def solve_digits(digits):
+    """Return the op codes of the path to a number given as a str, bytes or
+    bytearray of decimal digits, as Path.ops() does, for numbers of any
+    length. Runs without recursion or int/str conversions of the whole
+    number, in memory for its digits and one byte per step.
+
+    The number is held as a list of limbs of LIMB_DIGITS digits, the most
+    significant first, with the least significant limb apart as low, of
+    width digits, so a digit is stripped off in O(1). Doublings are held
+    back as value = m * N + c, for the held number N, a multiplier m, a
+    power of 2, and a carry c < m: the last digit of value depends only on
+    the last digit of N, and stripping it leaves value // 10 =
+    m * (N // 10) + (m * (N % 10) + c) // 10. Once m reaches FOLD_LIMIT the
+    doublings are applied to every limb at once.
+    """
+    if isinstance(digits, str):
+        digits = digits.encode("ascii")
+    digits = bytes(digits).lstrip(b"0")
+    if not digits:
+        raise ValueError("value must be greater than 0")
+    if not digits.isdigit():
+        raise ValueError("digits must be decimal digits")
+
+    width = len(digits) % LIMB_DIGITS or LIMB_DIGITS
+    low = int(digits[-width:])
+    limbs = [int(digits[i:i + LIMB_DIGITS])
+             for i in range(0, len(digits) - width, LIMB_DIGITS)]
+    m, c = 1, 0
+
+    ops = bytearray()
+
+    while limbs:
+        d = low % 10
+        value = m * d + c
+        digit = value % 10
+
+        if digit == 4 or digit == 0:
+            ops.append(OP_APPEND4 if digit == 4 else OP_APPEND0)
+            c = value // 10
+            low //= 10
+            width -= 1
+            if width == 0:
+                low, width = limbs.pop(), LIMB_DIGITS
+        else:
+            ops.append(OP_DIVIDE2)
+            m, c = m * 2, c * 2
+            if m >= FOLD_LIMIT:
+                low = _fold(limbs, low, width, m, c)
+                m, c = 1, 0
+
+    # what is left is small enough to solve directly
+    n = m * low + c
+    while n != 4:
+        op, n = _step(n)
+        ops.append(op)
+
+    ops.append(OP_START)
+    ops.reverse()
+    return bytes(ops)
+
+
+def _fold(limbs, low, width, m, c):
+    """Replace the number held in limbs and low, of width digits, by m times
+    it plus c, in place, and return the new low.
+    """
+    carry, low = divmod(m * low + c, 10**width)
+    for i in range(len(limbs) - 1, -1, -1):
+        carry, limbs[i] = divmod(m * limbs[i] + carry, LIMB)
+    high = []
+    while carry:
+        carry, limb = divmod(carry, LIMB)
+        high.append(limb)
+    high.reverse()
+    limbs[:0] = high
+    return low
+
+
+def step_counts(hi, path=None, processes=None):
+    """Return the number of steps in the path to each n in [0, hi), as
+    solve_iterative finds it (one less than the length of its list, with 0
+    for n = 0 and n = 4), as an array('I'). Given path, the counts are
+    written to the file at path as native unsigned ints instead, and a
+    memoryview of them over a memory map of it is returned; close it with
+    release_counts() when finished with.
+
+    Counts are found in levels [lo, 10 * lo), from BASE_SIZE up. Each path
+    from a level is followed only until it drops below lo, whose count is
+    then known, so the chunks of CHUNK_SIZE numbers of a level are counted
+    independently, by processes workers (by default one per core) writing
+    to the shared file. NumPy, if installed, follows the paths of a chunk
+    in lockstep.
+    """
+    if hi < 1:
+        raise ValueError("value must be greater than 0")
+
+    if path is None:
+        with tempfile.TemporaryDirectory() as directory:
+            counts = step_counts(hi, os.path.join(directory, "counts"),
+                                 processes)
+            try:
+                result = array("I")
+                with counts.cast("B") as raw:
+                    result.frombytes(raw)
+                return result
+            finally:
+                release_counts(counts)
+
+    with open(path, "w+b") as out:
+        out.truncate(hi * COUNT_SIZE)
+
+    lo = min(hi, BASE_SIZE)
+    with open(path, "r+b") as out, mmap.mmap(out.fileno(), 0) as buffer:
+        with memoryview(buffer).cast("I") as counts:
+            for n in range(1, lo):
+                counts[n] = len(solve_iterative(n)) - 1
+
+    executor = ProcessPoolExecutor(processes) if lo < hi else None
+    try:
+        while lo < hi:
+            top = min(hi, 10 * lo)
+            futures = [executor.submit(_count_chunk, path, lo, start,
+                                       min(start + CHUNK_SIZE, top))
+                       for start in range(lo, top, CHUNK_SIZE)]
+            for future in futures:
+                future.result()
+            lo = top
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return load_counts(path)
+
+
+def load_counts(path):
+    """Return a memoryview of the counts written by step_counts to the file
+    at path, over a read-only memory map of it.
+    """
+    with open(path, "rb") as source:
+        buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(buffer).cast("I")
+
+
+def release_counts(counts):
+    """Release a memoryview returned by load_counts and close its map."""
+    buffer = counts.obj
+    counts.release()
+    buffer.close()
+
+
+def length_distribution(counts):
+    """Return a dict of how many of n > 0 have each number of steps, from
+    the counts of step_counts.
+    """
+    if np is not None:
+        tally = np.bincount(np.frombuffer(counts, dtype=np.uint32)[1:])
+        return {steps: int(count) for steps, count in enumerate(tally)
+                if count}
+    return dict(sorted(Counter(counts[1:]).items()))
+
+
+def _count_chunk(path, lo, start, stop):
+    """Count the steps to each n in [start, stop) of the counts file at
+    path, following each path until it drops below lo.
+    """
+    with open(path, "r+b") as out, mmap.mmap(out.fileno(), 0) as buffer:
+        if np is not None:
+            counts = np.frombuffer(buffer, dtype=np.uint32)
+            try:
+                _count_array(counts, lo, start, stop)
+            finally:
+                del counts
+        else:
+            with memoryview(buffer).cast("I") as counts:
+                _count_loop(counts, lo, start, stop)
+
+
+def _count_loop(counts, lo, start, stop):
+    for n in range(start, stop):
+        steps = 0
+        while n >= lo:
+            digit = n % 10
+            n = n // 10 if digit == 4 or digit == 0 else n * 2
+            steps += 1
+        counts[start] = steps + counts[n]
+        start += 1
+
+
+def _count_array(counts, lo, start, stop):
+    """As _count_loop, following the paths of all the numbers at once and
+    dropping each as it falls below lo.
+    """
+    index = np.arange(start, stop, dtype=np.int64)
+    n = index.copy()
+    steps = np.zeros(len(n), dtype=np.uint32)
+    while len(n):
+        digit = n % 10
+        strip = (digit == 4) | (digit == 0)
+        n = np.where(strip, n // 10, n * 2)
+        steps += 1
+        done = n < lo
+        counts[index[done]] = steps[done] + counts[n[done]]
+        keep = ~done
+        index, n, steps = index[keep], n[keep], steps[keep]
+
+
+def _step(n):
+    """Return the op code of the last step of the path to n, reversing the
+    rules as solve_iterative does, and the number it is applied to.
+    """
+    prefix, digit = n // 10, n % 10
+
+    if digit == 4:
+        return OP_APPEND4, prefix
+    if digit == 0:
+        return OP_APPEND0, prefix
+    return OP_DIVIDE2, n * 2
+
+
+class Path:
+    """
+    A path from 4 to value, as a node in a tree of paths rooted at 4: the
+    path to parent followed by a step with op code op. Paths sharing a
+    prefix share its nodes, so a path costs one node beyond its parent.
+    Messages are only formatted when asked for.
+    """
+
+    __slots__ = ("parent", "op", "value", "length")
+
+    def __init__(self, parent, op, value):
+        self.parent = parent
+        self.op = op
+        self.value = value
+        self.length = parent.length + 1 if parent is not None else 1
+
+    def __len__(self):
+        return self.length
+
+    def ops(self):
+        """Return the op codes of the steps from 4, as bytes."""
+        ops = bytearray()
+        node = self
+        while node is not None:
+            ops.append(node.op)
+            node = node.parent
+        ops.reverse()
+        return bytes(ops)
+
+    def values(self):
+        """Return the numbers reached by the steps from 4, as a list."""
+        values = []
+        node = self
+        while node is not None:
+            values.append(node.value)
+            node = node.parent
+        values.reverse()
+        return values
+
+    def messages(self):
+        """Return the path as a list of messages, as solve_iterative does."""
+        return [MESSAGES[op](value)
+                for op, value in zip(self.ops(), self.values())]
+
+
+# the path of no steps, to 4
+ROOT = Path(None, OP_START, 4)
+
+
+class PathCache:
+    """
+    Solves for paths as solve_iterative does, keeping the Path to each
+    number met along the way in an LRU of size entries. A path is built
+    backwards from n only as far as the first number already cached, which
+    for many overlapping queries is usually a few steps, then joined to it.
+    """
+
+    size = DEFAULT_CACHE_SIZE
+    paths = None  # OrderedDict of n -> Path, least recently used first
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        if size < 1:
+            raise ValueError("cache size less than 1")
+        self.size = size
+        self.paths = OrderedDict()
+
+    def solve(self, n):
+        """Return the Path to n."""
+        if n < 1:
+            raise ValueError("value must be greater than 0")
+
+        steps = []
+        while n != 4:
+            path = self.paths.get(n)
+            if path is not None:
+                self.paths.move_to_end(n)
+                break
+            op, previous = _step(n)
+            steps.append((op, n))
+            n = previous
+        else:
+            path = ROOT
+
+        for op, value in reversed(steps):
+            path = Path(path, op, value)
+            self._store(value, path)
+
+        return path
+
+    def solve_range(self, lo, hi):
+        """Return a generator of the Path to each n in [lo, hi). In
+        ascending order, most numbers first step back to n // 10, which was
+        solved shortly before.
+        """
+        return (self.solve(n) for n in range(lo, hi))
+
+    def _store(self, n, path):
+        self.paths[n] = path
+        if len(self.paths) > self.size:
+            self.paths.popitem(last=False)
+
+
+_default_cache = PathCache()
+
+
+def benchmark(lo=1, hi=10**4):
+    """Print the time taken and the mean and longest path lengths of
+    solve_iterative and solve_optimal over each n in [lo, hi), and how many
+    paths solve_optimal shortens.
+    """
+    lengths = {}
+    for name, solver in (("greedy", solve_iterative),
+                         ("optimal", solve_optimal)):
+        begin = time.perf_counter()
+        lengths[name] = [len(solver(n)) for n in range(lo, hi)]
+        elapsed = time.perf_counter() - begin
+        print("%-7s %d paths %6.4f seconds, mean length %.3f, longest %d" %
+              (name, hi - lo, elapsed, sum(lengths[name]) / (hi - lo),
+               max(lengths[name])))
+
+    shorter = sum(1 for greedy, optimal in
+                  zip(lengths["greedy"], lengths["optimal"])
+                  if optimal < greedy)
+    print("optimal shorter for", shorter, "paths")
+
+
 # tests ############################################################
 
 def test_solve_0_should_raise():
@@ -126,3 +619,180 @@ def test_solve_17():
     ]
     assert solve_iterative(17) == expect
     assert solve_recursive(17) == expect
+
+
+# solve_cached and solve_range
+
+def test_solve_cached_agrees_with_solve_iterative():
+    cache = PathCache()
+    for n in list(range(1, 2000)) + [10**12 + 7, 2**40]:
+        path = cache.solve(n)
+        assert path.messages() == solve_iterative(n)
+        assert len(path) == len(path.ops()) == len(solve_iterative(n))
+        assert path.values()[-1] == n
+
+
+def test_solve_cached_op_codes():
+    assert solve_cached(4).ops() == bytes([OP_START])
+    assert solve_cached(17).ops() == bytes([
+        OP_START, OP_DIVIDE2, OP_APPEND4, OP_DIVIDE2,
+        OP_DIVIDE2, OP_DIVIDE2, OP_APPEND4, OP_DIVIDE2])
+
+
+def test_solve_range_agrees_with_solve_iterative():
+    paths = list(solve_range(1, 500))
+    assert [path.messages() for path in paths] == \
+        [solve_iterative(n) for n in range(1, 500)]
+
+
+def test_paths_share_prefixes():
+    cache = PathCache()
+    assert cache.solve(104).parent is cache.solve(10)
+
+
+def test_cache_is_bounded():
+    cache = PathCache(16)
+    for path in cache.solve_range(1, 1000):
+        assert len(cache.paths) <= 16
+    assert cache.solve(999).messages() == solve_iterative(999)
+
+
+def test_bad_cache_use_should_raise():
+    with pytest.raises(ValueError):
+        PathCache(0)
+    with pytest.raises(ValueError):
+        solve_cached(0)
+
+
+# solve_optimal
+
+def is_path_to(path, n):
+    """Check each step of path follows a rule, from 4 to n."""
+    values = path.values()
+    for op, previous, value in zip(path.ops()[1:], values, values[1:]):
+        if op == OP_APPEND0:
+            assert value == previous * 10
+        elif op == OP_APPEND4:
+            assert value == previous * 10 + 4
+        else:
+            assert value * 2 == previous
+    return values[0] == 4 and values[-1] == n
+
+
+def test_solve_optimal_finds_valid_paths():
+    for n in list(range(1, 1000)) + [10**9 + 7]:
+        path = solve_optimal(n)
+        assert is_path_to(path, n)
+        assert len(path) <= len(solve_iterative(n))
+
+
+def test_solve_optimal_examples():
+    assert solve_optimal(4).messages() == [START(4)]
+    assert len(solve_optimal(13)) == 8
+    assert len(solve_optimal(17)) == 8
+
+
+def test_solve_optimal_gives_up_at_limit():
+    assert solve_optimal(999, limit=4).messages() == solve_iterative(999)
+
+
+def test_solve_optimal_0_should_raise():
+    with pytest.raises(ValueError):
+        solve_optimal(0)
+
+
+# solve_digits
+
+def test_solve_digits_agrees_with_solve_cached():
+    numbers = list(range(1, 2000)) + [10**17 + 3, 10**18 - 1, 10**18,
+                                      10**18 + 4, 2**200 + 1, 7**300]
+    for n in numbers:
+        assert solve_digits(str(n)) == solve_cached(n).ops()
+    assert solve_digits(b"0013") == solve_cached(13).ops()
+
+
+def test_solve_digits_with_10k_digits():
+    rand = random.Random(24)
+    digits = "1" + "".join(rand.choice("0123456789") for _ in range(9999))
+    ops = solve_digits(digits)
+
+    # replay forwards from 4
+    n = 4
+    for op in ops[1:]:
+        if op == OP_APPEND0:
+            n = n * 10
+        elif op == OP_APPEND4:
+            n = n * 10 + 4
+        else:
+            n //= 2
+    assert n == _digits_to_int(digits)
+
+
+def _digits_to_int(digits):
+    """Convert decimal digits to an int a limb at a time, beyond the default
+    int/str conversion limit.
+    """
+    n = 0
+    for i in range(0, len(digits), LIMB_DIGITS):
+        chunk = digits[i:i + LIMB_DIGITS]
+        n = n * 10**len(chunk) + int(chunk)
+    return n
+
+
+def test_solve_digits_raises_with_bad_digits():
+    for digits in ["", "0", "000", "12a", "-12"]:
+        with pytest.raises(ValueError):
+            solve_digits(digits)
+
+
+# step_counts
+
+def test_step_counts_agree_with_solve_iterative(monkeypatch):
+    monkeypatch.setattr(sys.modules[__name__], "CHUNK_SIZE", 1000)
+    counts = step_counts(20000, processes=2)
+    assert len(counts) == 20000
+    assert counts[0] == 0 and counts[4] == 0
+    for n in range(1, 20000):
+        assert counts[n] == len(solve_iterative(n)) - 1
+
+
+def test_count_loop_agrees_with_count_array():
+    if np is None:
+        pytest.skip("numpy is not installed")
+    lo, hi = 1000, 10000
+    counts = step_counts(lo)
+    looped = array("I", counts) + array("I", bytes(4 * (hi - lo)))
+    _count_loop(looped, lo, lo, hi)
+    vectorised = np.zeros(hi, dtype=np.uint32)
+    vectorised[:lo] = counts
+    _count_array(vectorised, lo, lo, hi)
+    assert vectorised.tolist() == looped.tolist()
+
+
+def test_step_counts_to_file(tmp_path):
+    path = tmp_path / "counts"
+    counts = step_counts(5000, path, processes=1)
+    try:
+        assert path.stat().st_size == 5000 * COUNT_SIZE
+        assert counts.tolist() == step_counts(5000).tolist()
+        loaded = load_counts(path)
+        assert loaded.tolist() == counts.tolist()
+        release_counts(loaded)
+    finally:
+        release_counts(counts)
+
+
+def test_length_distribution():
+    counts = step_counts(1000)
+    expect = Counter(len(solve_iterative(n)) - 1 for n in range(1, 1000))
+    assert length_distribution(counts) == dict(sorted(expect.items()))
+    assert step_counts(3).tolist() == [0, 2, 1]
+
+
+def test_step_counts_0_should_raise():
+    with pytest.raises(ValueError):
+        step_counts(0)
+
+
+if __name__ == "__main__":
+    benchmark(*(int(arg) for arg in sys.argv[1:3]))